@@ -5,7 +5,10 @@ from typing import Dict
 from src.analysis.signals import MarketData
 
 
-@dataclass
+_LATEST_COLUMNS = ("Close", "EMA_20", "EMA_50", "EMA_200", "RSI", "ATR_Ratio", "ATR")
+
+
+@dataclass(slots=True)
 class EntrySecondaryFilterConfig:
     enabled: bool = False
     require_ema_bull_stack: bool = True
@@ -42,7 +45,14 @@ class EntrySecondaryFilter:
         if df.empty:
             return False
 
-        return self.passes_latest(df.iloc[-1])
+        # 只取用到的列的最后一个值，避免 df.iloc[-1] 构造整行 Series
+        columns = df.columns
+        latest = {
+            column: df[column].to_numpy()[-1]
+            for column in _LATEST_COLUMNS
+            if column in columns
+        }
+        return self.passes_latest(latest)
 
     def passes_latest(self, latest) -> bool:
         if not self.config.enabled:
@@ -52,13 +62,6 @@ class EntrySecondaryFilter:
         if self.config.min_price is not None and close_price < self.config.min_price:
             return False
 
-        if self.config.require_ema_bull_stack:
-            ema20 = float(latest.get("EMA_20", 0) or 0)
-            ema50 = float(latest.get("EMA_50", 0) or 0)
-            ema200 = float(latest.get("EMA_200", 0) or 0)
-            if not (ema20 > ema50 > ema200):
-                return False
-
         if self.config.rsi_min is not None or self.config.rsi_max is not None:
             rsi = float(latest.get("RSI", -1) or -1)
             if self.config.rsi_min is not None and rsi < self.config.rsi_min:
@@ -74,6 +77,13 @@ class EntrySecondaryFilter:
         if self.config.atr_price_max is not None and atr_price > self.config.atr_price_max:
             return False
 
+        if self.config.require_ema_bull_stack:
+            ema20 = float(latest.get("EMA_20", 0) or 0)
+            ema50 = float(latest.get("EMA_50", 0) or 0)
+            ema200 = float(latest.get("EMA_200", 0) or 0)
+            if not (ema20 > ema50 > ema200):
+                return False
+
         return True
 
 
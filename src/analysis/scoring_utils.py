@@ -25,16 +25,44 @@
         return TradingSignal(action=SELL, ...)
 """
 
+import math
+
 import pandas as pd
 import numpy as np
-from typing import Dict, Tuple, Optional
-from datetime import timedelta
+from typing import Callable, Dict, NamedTuple, Tuple, Optional, Union
 
 
 # =====================================================================
 # 核心打分函数
 # =====================================================================
 
+# 技术面打分用到的列（顺序即 _technical_score_values 的参数顺序）
+TECHNICAL_SCORE_COLUMNS = (
+    "Close",
+    "EMA_20",
+    "EMA_50",
+    "EMA_200",
+    "RSI",
+    "MACD_Hist",
+    "MACD",
+)
+
+# 基本面打分用到的财报数值列
+FUNDAMENTAL_SCORE_COLUMNS = ("Sales", "OperatingProfit", "FSales")
+
+# 机构流向增强版：Smart Money / Dumb Money 对应的投资主体列
+SMART_MONEY_COLUMNS = ('FrgnBal', 'TrustBal', 'InvTrustBal', 'InsuranceBal')
+DUMB_MONEY_COLUMNS = ('IndividualBal', 'SecuritiesBal')
+
+# 综合分数默认权重（Simple策略 40/30/20/10）；逐日与批量打分共用，只读
+DEFAULT_SCORE_WEIGHTS: Dict[str, float] = {
+    "technical": 0.4,
+    "institutional": 0.3,
+    "fundamental": 0.2,
+    "volatility": 0.1
+}
+
+
 def calculate_technical_score(df_features: pd.DataFrame) -> float:
     """
     计算技术面分数 (0-100)
@@ -53,33 +81,87 @@ def calculate_technical_score(df_features: pd.DataFrame) -> float:
     if df_features.empty:
         return 50.0
     
-    latest = df_features.iloc[-1]
+    # 只取最后一行的各列值，交给纯标量核心（单行走numpy会被分派开销淹没）
+    return _technical_score_scalar(*_latest_floats(df_features, TECHNICAL_SCORE_COLUMNS))
+
+
+def _latest_floats(df: pd.DataFrame, columns) -> list:
+    """
+    最后一行指定列的float值（缺列抛KeyError，与 df[column] 一致）
+
+    按 get_loc 定位列号后从一次行视图里按整数取值，
+    不为每列构造一个Series；列名重复时退回逐列读取。
+    """
+    get_loc = df.columns.get_loc
+    positions = [get_loc(column) for column in columns]
+    if all(isinstance(pos, int) for pos in positions):
+        row = df.iloc[-1].to_numpy()
+        return [_to_float(row[pos]) for pos in positions]
+    return [_to_float(df[column].to_numpy()[-1]) for column in columns]
+
+
+def _technical_score_scalar(
+    close: float,
+    ema20: float,
+    ema50: float,
+    ema200: float,
+    rsi: float,
+    macd_hist: float,
+    macd: float
+) -> float:
+    """_technical_score_values 的标量版本（float输入，NaN比较恒为False）"""
     score = 50.0
     
-    # 1. EMA Perfect Order (The "Perfect Order")
-    if latest['Close'] > latest['EMA_20'] > latest['EMA_50'] > latest['EMA_200']:
-        score += 20  # 完美趋势
-    elif latest['Close'] > latest['EMA_200']:
-        score += 10  # 基本趋势向上
-    elif latest['Close'] < latest['EMA_200']:
-        score -= 20  # 趋势向下
+    if close > ema20 and ema20 > ema50 and ema50 > ema200:
+        score += 20.0
+    elif close > ema200:
+        score += 10.0
+    elif close < ema200:
+        score -= 20.0
     
-    # 2. RSI Logic
-    rsi = latest['RSI']
     if 40 <= rsi <= 65:
-        score += 10  # 健康区间
+        score += 10.0
     elif rsi > 75:
-        score -= 10  # 超买
+        score -= 10.0
     elif rsi < 30:
-        score += 5   # 超卖反弹机会
+        score += 5.0
     
-    # 3. MACD Momentum
-    if latest['MACD_Hist'] > 0:
-        score += 10  # 正动量
-        if latest['MACD'] > 0:
-            score += 5  # 强动量
+    if macd_hist > 0:
+        score += 10.0
+        if macd > 0:
+            score += 5.0
     
-    return np.clip(score, 0, 100)
+    return min(max(score, 0.0), 100.0)
+
+
+def _technical_score_values(
+    close: np.ndarray,
+    ema20: np.ndarray,
+    ema50: np.ndarray,
+    ema200: np.ndarray,
+    rsi: np.ndarray,
+    macd_hist: np.ndarray,
+    macd: np.ndarray
+) -> np.ndarray:
+    """技术面打分核心（ndarray输入，单行与批量共用）"""
+    score = np.full(close.shape, 50.0)
+    
+    # 1. EMA Perfect Order: 完美趋势 / 基本趋势向上 / 趋势向下
+    perfect_order = (close > ema20) & (ema20 > ema50) & (ema50 > ema200)
+    score += np.select(
+        [perfect_order, close > ema200, close < ema200], [20.0, 10.0, -20.0], 0.0
+    )
+    
+    # 2. RSI: 健康区间 / 超买 / 超卖反弹机会
+    score += np.select(
+        [(rsi >= 40) & (rsi <= 65), rsi > 75, rsi < 30], [10.0, -10.0, 5.0], 0.0
+    )
+    
+    # 3. MACD Momentum: 正动量 / 强动量
+    positive_hist = macd_hist > 0
+    score += 10.0 * positive_hist + 5.0 * (positive_hist & (macd > 0))
+    
+    return np.clip(score, 0.0, 100.0)
 
 
 def calculate_institutional_score(
@@ -103,26 +185,19 @@ def calculate_institutional_score(
     if df_trades.empty:
         return 50.0
     
-    df_trades = df_trades.copy()
-    df_trades['EnDate'] = pd.to_datetime(df_trades['EnDate'])
-    
-    # 过滤日期范围
-    start_date = current_date - timedelta(days=lookback_days)
-    mask = (df_trades['EnDate'] <= current_date) & (df_trades['EnDate'] >= start_date)
-    recent = df_trades.loc[mask].sort_values('EnDate')
-    
-    if recent.empty:
+    # 过滤日期范围 [start_date, current_date]：已排序时只定位行区间，按列数组切片
+    trades, start, stop = _trade_window(df_trades, current_date, lookback_days, include_start=True)
+    if stop <= start:
         return 50.0
     
     score = 50.0
     
     if use_smart_money:
-        # 增强版：Smart Money vs Dumb Money
-        smart_cols = ['FrgnBal', 'TrustBal', 'InvTrustBal', 'InsuranceBal']
-        dumb_cols = ['IndividualBal', 'SecuritiesBal']
-        
-        smart_flow = sum(recent[col].sum() for col in smart_cols if col in recent.columns)
-        dumb_flow = sum(recent[col].sum() for col in dumb_cols if col in recent.columns)
+        # 增强版：Smart Money vs Dumb Money（逐行先合计各列，再按窗口求和）
+        window = slice(start, stop)
+        smart_rows = _row_flows(trades, SMART_MONEY_COLUMNS, window)
+        smart_flow = smart_rows.sum()
+        dumb_flow = _row_flows(trades, DUMB_MONEY_COLUMNS, window).sum()
         
         if smart_flow > 0:
             score += 25
@@ -131,30 +206,56 @@ def calculate_institutional_score(
         elif smart_flow < 0:
             score -= 15
         
-        # 加速度检测
-        if len(recent) >= 14:
-            recent_week = recent.tail(7)
-            prev_week = recent.iloc[-14:-7]
-            
-            if not recent_week.empty and not prev_week.empty:
-                recent_smart = sum(recent_week[col].sum() for col in smart_cols if col in recent_week.columns)
-                prev_smart = sum(prev_week[col].sum() for col in smart_cols if col in prev_week.columns)
-                
-                if recent_smart > prev_smart:
-                    score += 10  # 加速买入
+        # 加速度检测：最近7条 vs 之前7条
+        if len(smart_rows) >= 14:
+            if smart_rows[-7:].sum() > smart_rows[-14:-7].sum():
+                score += 10  # 加速买入
     else:
-        # 简单版：仅看外资
-        net_foreign_flow = recent['FrgnBal'].sum()
+        # 简单版：仅看外资（NaN跳过，与Series.sum/mean一致）
+        foreign = _float_values(trades, 'FrgnBal')[start:stop]
+        net_foreign_flow = np.nansum(foreign)
         
         if net_foreign_flow > 0:
             score += 20
             # 最近更强
-            if recent.iloc[-1]['FrgnBal'] > recent['FrgnBal'].mean():
+            if foreign[-1] > np.nanmean(foreign):
                 score += 10
         elif net_foreign_flow < 0:
             score -= 15
     
-    return np.clip(score, 0, 100)
+    return min(max(score, 0.0), 100.0)
+
+
+def prepare_financials(df_financials: pd.DataFrame) -> pd.DataFrame:
+    """
+    财报数据一次性标准化：DiscDate转datetime并按披露日稳定排序，打分用到的数值列转float64
+
+    在加载财报时调用一次，之后每个bar的基本面打分不再逐值解析字符串，
+    也不必再判断/处理乱序。
+    
+    Args:
+        df_financials: 原始财务数据（不修改）
+        
+    Returns:
+        标准化后的财务数据
+    """
+    if df_financials is None or df_financials.empty:
+        return pd.DataFrame() if df_financials is None else df_financials
+    
+    updates = {
+        column: pd.to_numeric(df_financials[column], errors='coerce').astype('float64')
+        for column in FUNDAMENTAL_SCORE_COLUMNS
+        if column in df_financials.columns
+        and df_financials[column].dtype != np.float64
+    }
+    has_dates = 'DiscDate' in df_financials.columns
+    if has_dates and not pd.api.types.is_datetime64_any_dtype(df_financials['DiscDate']):
+        updates['DiscDate'] = pd.to_datetime(df_financials['DiscDate'])
+    
+    df = df_financials.assign(**updates) if updates else df_financials
+    if has_dates and not df['DiscDate'].is_monotonic_increasing:
+        df = df.sort_values('DiscDate', kind='stable')
+    return df
 
 
 def calculate_fundamental_score(df_financials: pd.DataFrame) -> float:
@@ -175,17 +276,62 @@ def calculate_fundamental_score(df_financials: pd.DataFrame) -> float:
     if df_financials.empty or len(df_financials) < 2:
         return 50.0
     
-    df_fins = df_financials.sort_values('DiscDate')
-    latest = df_fins.iloc[-1]
-    prev = df_fins.iloc[-2]
+    # 按列取最近两期的原始值，不构造整行Series（混合dtype的行要逐列装箱）
+    positions = _latest_two_positions(df_financials['DiscDate'])
+    prev_sales, sales = _last_two_floats(df_financials, 'Sales', positions)
+    prev_op, op = _last_two_floats(df_financials, 'OperatingProfit', positions)
+    forecast_sales = _last_two_floats(df_financials, 'FSales', positions)[1]
+    
+    return _fundamental_score_scalar(sales, prev_sales, op, prev_op, forecast_sales)
+
+
+def _latest_two_positions(disc_dates: pd.Series) -> Tuple[int, int]:
+    """
+    最近两期财报的行位置 (上期, 最新)
+    
+    回测中财报已按披露日排好序，直接取末两行；乱序时用partition在O(N)内
+    找出第二晚的披露日，只对不早于它的行排序，不复制整表。NaT与sort_values
+    一致视为最晚。
+    """
+    n = len(disc_dates)
+    if disc_dates.is_monotonic_increasing:
+        return n - 2, n - 1
     
+    dates = pd.to_datetime(disc_dates).to_numpy(dtype='datetime64[ns]')
+    keys = np.where(np.isnat(dates), np.iinfo(np.int64).max, dates.view(np.int64))
+    second_latest = np.partition(keys, n - 2)[n - 2]
+    candidates = np.flatnonzero(keys >= second_latest)
+    # 多期同日时按 (披露日, 行号) 取最后两行，与稳定排序一致
+    ordered = candidates[np.argsort(keys[candidates], kind='stable')]
+    return int(ordered[-2]), int(ordered[-1])
+
+
+def _last_two_floats(
+    df: pd.DataFrame,
+    column: str,
+    positions: Tuple[int, int] = (-2, -1)
+) -> Tuple[float, float]:
+    """列在 (上期, 最新) 行位置上的值转float；缺列按0（与 row.get(col, 0) 一致）"""
+    if column not in df.columns:
+        return 0.0, 0.0
+    values = df[column].to_numpy()
+    return _to_float(values[positions[0]]), _to_float(values[positions[1]])
+
+
+def _fundamental_score_scalar(
+    sales: float,
+    prev_sales: float,
+    op: float,
+    prev_op: float,
+    forecast_sales: float
+) -> float:
+    """基本面打分的标量核心（_fundamental_score_values 的逐元素版本）"""
+    # NaN参与的比较恒为False：上期不为正/任一值缺失时增长率分档与超预期判断自然不命中，
+    # 无需逐项 isnan 分支（与 _fundamental_score_values 的掩码语义一致）
     score = 50.0
     
     # 1. 营收增长
-    sales = pd.to_numeric(latest.get('Sales', 0), errors='coerce')
-    prev_sales = pd.to_numeric(prev.get('Sales', 0), errors='coerce')
-    
-    if pd.notna(sales) and pd.notna(prev_sales) and prev_sales > 0:
+    if prev_sales > 0:
         sales_growth = (sales / prev_sales - 1) * 100
         if sales_growth > 10:
             score += 15
@@ -195,10 +341,7 @@ def calculate_fundamental_score(df_financials: pd.DataFrame) -> float:
             score -= 15
     
     # 2. 营业利润增长
-    op = pd.to_numeric(latest.get('OperatingProfit', 0), errors='coerce')
-    prev_op = pd.to_numeric(prev.get('OperatingProfit', 0), errors='coerce')
-    
-    if pd.notna(op) and pd.notna(prev_op) and prev_op > 0:
+    if prev_op > 0:
         op_growth = (op / prev_op - 1) * 100
         if op_growth > 15:
             score += 20
@@ -208,12 +351,10 @@ def calculate_fundamental_score(df_financials: pd.DataFrame) -> float:
             score -= 20
     
     # 3. Forecast beat (财报超预期)
-    forecast_sales = pd.to_numeric(latest.get('FSales', 0), errors='coerce')
-    if pd.notna(forecast_sales) and pd.notna(sales) and forecast_sales > 0:
-        if sales > forecast_sales * 1.03:  # 超预期3%
-            score += 15
+    if forecast_sales > 0 and sales > forecast_sales * 1.03:  # 超预期3%
+        score += 15
     
-    return np.clip(score, 0, 100)
+    return min(max(score, 0.0), 100.0)
 
 
 def calculate_volatility_score(df_features: pd.DataFrame) -> float:
@@ -232,26 +373,105 @@ def calculate_volatility_score(df_features: pd.DataFrame) -> float:
     if df_features.empty or len(df_features) < 20:
         return 50.0
     
-    latest = df_features.iloc[-1]
-    score = 50.0
-    
-    # ATR相对历史水平（优先使用预计算列）
-    atr_zscore = latest.get('ATR_Z_60', np.nan)
-    if pd.isna(atr_zscore):
-        atr_current = latest['ATR']
-        atr_avg = df_features['ATR'].tail(60).mean()
-        atr_std = df_features['ATR'].tail(60).std()
+    atr_zscore = _latest_atr_zscore(df_features)
+    return _volatility_score_scalar(atr_zscore)
 
-        if pd.notna(atr_avg) and pd.notna(atr_std) and atr_std > 0:
-            atr_zscore = (atr_current - atr_avg) / atr_std
 
-    if pd.notna(atr_zscore):
-        if atr_zscore < -0.5:  # 低于平均（低波动）
-            score += 20
-        elif atr_zscore > 1.0:  # 高于平均（高波动）
-            score -= 20
+def _latest_feature_inputs(df_features: pd.DataFrame) -> Tuple[list, float]:
+    """
+    技术面打分的7个输入 + 最新ATR z-score，从同一次行视图中读取
+
+    不足20行时z-score为NaN（波动性按50分），与 calculate_volatility_score 一致。
+    """
+    has_zscore = 'ATR_Z_60' in df_features.columns
+    columns = TECHNICAL_SCORE_COLUMNS + (('ATR_Z_60',) if has_zscore else ())
+    latest = _latest_floats(df_features, columns)
+    technical_inputs = latest[:len(TECHNICAL_SCORE_COLUMNS)]
+    if len(df_features) < 20:
+        return technical_inputs, math.nan
+    latest_zscore = latest[-1] if has_zscore else math.nan
+    return technical_inputs, _latest_atr_zscore(df_features, latest_zscore)
+
+
+def _latest_atr_zscore(
+    df_features: pd.DataFrame,
+    latest_zscore: Optional[float] = None
+) -> float:
+    """
+    最新ATR相对近60日的z-score（优先使用预计算列ATR_Z_60），无法计算时为NaN
+
+    latest_zscore: 调用方已读出的ATR_Z_60末值（None时自行读取）
+    """
+    atr_zscore = latest_zscore
+    if atr_zscore is None:
+        atr_zscore = np.nan
+        if 'ATR_Z_60' in df_features.columns:
+            atr_zscore = _to_float(df_features['ATR_Z_60'].to_numpy()[-1])
+    if math.isnan(atr_zscore):
+        # ATR_Z_60 缺失或处于前59行预热期：只取最后60个值在ndarray上算均值/标准差
+        atr_tail = _float_values(df_features.iloc[-60:], 'ATR')
+        finite = atr_tail[~np.isnan(atr_tail)]
+        if len(finite) >= 2:
+            atr_avg = finite.mean()
+            atr_std = finite.std(ddof=1)
+            if atr_std > 0:
+                atr_zscore = (atr_tail[-1] - atr_avg) / atr_std
+    return atr_zscore
+
+
+def _volatility_score_scalar(atr_zscore: float) -> float:
+    """_volatility_score_values 的标量版本（NaN比较恒为False）"""
+    if atr_zscore < -0.5:
+        return 70.0
+    if atr_zscore > 1.0:
+        return 30.0
+    return 50.0
+
+
+def _volatility_score_values(atr_zscore: np.ndarray) -> np.ndarray:
+    """波动性打分核心：低于平均（低波动）+20，高于平均（高波动）-20，NaN不调整"""
+    return 50.0 + np.select([atr_zscore < -0.5, atr_zscore > 1.0], [20.0, -20.0], 0.0)
+
+
+# (technical, institutional, fundamental, volatility) -> 加权总分（标量或等长ndarray均可）
+ScoreCombiner = Callable[[float, float, float, float], float]
+
+
+def make_score_combiner(weights: Dict[str, float]) -> ScoreCombiner:
+    """
+    把固定权重固化进加权求和函数
+    
+    权重在策略构造时就已确定，逐日打分时不必再四次查字典；
+    求和顺序与 calculate_composite_score 一致，结果逐位相同。
+    
+    Args:
+        weights: 权重配置（technical/institutional/fundamental/volatility）
+        
+    Returns:
+        combine(technical, institutional, fundamental, volatility) -> 加权总分
+    """
+    w_tech = weights["technical"]
+    w_inst = weights["institutional"]
+    w_fund = weights["fundamental"]
+    w_vol = weights["volatility"]
+    
+    def combine(
+        technical: float,
+        institutional: float,
+        fundamental: float,
+        volatility: float
+    ) -> float:
+        return (
+            technical * w_tech +
+            institutional * w_inst +
+            fundamental * w_fund +
+            volatility * w_vol
+        )
     
-    return np.clip(score, 0, 100)
+    return combine
+
+
+_DEFAULT_SCORE_COMBINER = make_score_combiner(DEFAULT_SCORE_WEIGHTS)
 
 
 def calculate_composite_score(
@@ -260,7 +480,8 @@ def calculate_composite_score(
     df_financials: pd.DataFrame,
     metadata: dict,
     weights: Dict[str, float] = None,
-    current_date: pd.Timestamp = None
+    current_date: pd.Timestamp = None,
+    combine: Optional[ScoreCombiner] = None
 ) -> Tuple[float, Dict[str, float]]:
     """
     计算综合分数
@@ -272,6 +493,7 @@ def calculate_composite_score(
         metadata: 元数据
         weights: 权重配置，默认为Simple权重 (40/30/20/10)
         current_date: 当前日期（用于机构流向计算）
+        combine: make_score_combiner 生成的加权函数（给定时忽略weights）
         
     Returns:
         (total_score, breakdown)
@@ -279,13 +501,11 @@ def calculate_composite_score(
         - breakdown: 各组件分数字典
     """
     # 默认权重（Simple策略）
-    if weights is None:
-        weights = {
-            "technical": 0.4,
-            "institutional": 0.3,
-            "fundamental": 0.2,
-            "volatility": 0.1
-        }
+    if combine is None:
+        if weights is None:
+            combine = _DEFAULT_SCORE_COMBINER
+        else:
+            combine = make_score_combiner(weights)
     
     # 当前日期
     if current_date is None:
@@ -295,18 +515,18 @@ def calculate_composite_score(
             current_date = pd.Timestamp.now()
     
     # 计算各组件分数
-    tech_score = calculate_technical_score(df_features)
+    if df_features.empty:
+        tech_score = vol_score = 50.0
+    else:
+        # 技术面与波动性共用一次最新行读取
+        technical_inputs, atr_zscore = _latest_feature_inputs(df_features)
+        tech_score = _technical_score_scalar(*technical_inputs)
+        vol_score = _volatility_score_scalar(atr_zscore)
     inst_score = calculate_institutional_score(df_trades, current_date)
     fund_score = calculate_fundamental_score(df_financials)
-    vol_score = calculate_volatility_score(df_features)
     
     # 加权组合
-    total_score = (
-        tech_score * weights["technical"] +
-        inst_score * weights["institutional"] +
-        fund_score * weights["fundamental"] +
-        vol_score * weights["volatility"]
-    )
+    total_score = combine(tech_score, inst_score, fund_score, vol_score)
     
     breakdown = {
         "technical": tech_score,
@@ -318,10 +538,458 @@ def calculate_composite_score(
     return total_score, breakdown
 
 
+def calculate_composite_scores(
+    universe: Dict[str, Dict[str, pd.DataFrame]],
+    weights: Dict[str, float] = None,
+    current_date: pd.Timestamp = None
+) -> pd.DataFrame:
+    """
+    对整个股票池一次性计算最新综合分数
+
+    技术面/波动性分数把各股票最新值堆叠后各走一次向量化打分，加权也按列一次完成；
+    每只股票的结果与 calculate_composite_score 相同。
+
+    Args:
+        universe: {ticker: {"features": df, "trades": df, "financials": df}}
+        weights: 权重配置，默认为Simple权重 (40/30/20/10)
+        current_date: 当前日期，None时使用各股票features的最后日期
+
+    Returns:
+        以ticker为索引的DataFrame，列为 total 及各组件分数
+    """
+    combine = _DEFAULT_SCORE_COMBINER if weights is None else make_score_combiner(weights)
+    
+    tickers = list(universe)
+    technical_inputs = np.full((len(TECHNICAL_SCORE_COLUMNS), len(tickers)), np.nan)
+    has_features = np.zeros(len(tickers), dtype=bool)
+    institutional = np.empty(len(tickers))
+    fundamental = np.empty(len(tickers))
+    atr_zscores = np.full(len(tickers), np.nan)
+    
+    for pos, ticker in enumerate(tickers):
+        data = universe[ticker]
+        df_features = data.get("features", pd.DataFrame())
+        df_trades = data.get("trades")
+        df_financials = data.get("financials")
+        df_trades = df_trades if df_trades is not None else pd.DataFrame()
+        df_financials = df_financials if df_financials is not None else pd.DataFrame()
+        
+        ticker_date = current_date
+        if not df_features.empty:
+            has_features[pos] = True
+            # 技术面输入与ATR z-score共用一次最新行读取
+            technical_inputs[:, pos], atr_zscores[pos] = _latest_feature_inputs(df_features)
+            if ticker_date is None:
+                ticker_date = df_features.index[-1]
+        elif ticker_date is None:
+            ticker_date = pd.Timestamp.now()
+        
+        institutional[pos] = calculate_institutional_score(df_trades, ticker_date)
+        fundamental[pos] = calculate_fundamental_score(df_financials)
+    
+    technical = np.where(has_features, _technical_score_values(*technical_inputs), 50.0)
+    volatility = _volatility_score_values(atr_zscores)
+    return _composite_score_frame(
+        combine,
+        technical,
+        institutional,
+        fundamental,
+        volatility,
+        index=pd.Index(tickers, name="ticker")
+    )
+
+
+def _composite_score_frame(
+    combine: ScoreCombiner,
+    technical: np.ndarray,
+    institutional: np.ndarray,
+    fundamental: np.ndarray,
+    volatility: np.ndarray,
+    index: pd.Index
+) -> pd.DataFrame:
+    """批量打分的输出表：各组件数组按列加权（与逐日打分共用同一个combine）"""
+    return pd.DataFrame(
+        {
+            "total": combine(technical, institutional, fundamental, volatility),
+            "technical": technical,
+            "institutional": institutional,
+            "fundamental": fundamental,
+            "volatility": volatility
+        },
+        index=index
+    )
+
+
+def calculate_composite_score_panel(
+    panel_features: pd.DataFrame,
+    panel_trades: Optional[pd.DataFrame] = None,
+    panel_financials: Optional[pd.DataFrame] = None,
+    weights: Dict[str, float] = None
+) -> pd.DataFrame:
+    """
+    对长表（多只股票 × 多日）一次性计算逐bar综合分数
+
+    技术面是逐行打分，整张长表只走一次向量化核心；波动性、机构、基本面
+    需要按股票各自的时间窗口，按ticker分组后各调用一次批量函数。
+    每行结果与该股票截至当日调用 calculate_composite_score 一致。
+
+    Args:
+        panel_features: 以 (ticker, date) 为MultiIndex的技术指标长表，组内按日期升序
+        panel_trades: 含 ticker 列的机构交易长表
+        panel_financials: 含 ticker 列的财务长表
+        weights: 权重配置，默认为Simple权重 (40/30/20/10)
+
+    Returns:
+        与panel_features同索引的DataFrame，列为 total 及各组件分数
+    """
+    combine = _DEFAULT_SCORE_COMBINER if weights is None else make_score_combiner(weights)
+    if panel_features.index.nlevels != 2:
+        raise ValueError("panel_features must be indexed by (ticker, date)")
+    
+    trades_by_ticker = _group_by_ticker(panel_trades)
+    financials_by_ticker = _group_by_ticker(panel_financials)
+    
+    technical = calculate_technical_score_series(panel_features).to_numpy(dtype="float64")
+    institutional = np.empty(len(panel_features))
+    fundamental = np.empty(len(panel_features))
+    volatility = np.empty(len(panel_features))
+    
+    ticker_codes, tickers = pd.factorize(panel_features.index.get_level_values(0))
+    dates = pd.DatetimeIndex(panel_features.index.get_level_values(1))
+    for code, ticker in enumerate(tickers):
+        rows = np.flatnonzero(ticker_codes == code)
+        ticker_dates = dates[rows]
+        empty = pd.DataFrame()
+        volatility[rows] = calculate_volatility_score_series(panel_features.iloc[rows]).to_numpy()
+        institutional[rows] = calculate_institutional_score_series(
+            ticker_dates, trades_by_ticker.get(ticker, empty)
+        ).to_numpy()
+        fundamental[rows] = calculate_fundamental_score_series(
+            ticker_dates, financials_by_ticker.get(ticker, empty)
+        ).to_numpy()
+    
+    return _composite_score_frame(
+        combine,
+        technical,
+        institutional,
+        fundamental,
+        volatility,
+        index=panel_features.index
+    )
+
+
+def _group_by_ticker(panel: Optional[pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    if panel is None or panel.empty or "ticker" not in panel.columns:
+        return {}
+    return {ticker: group for ticker, group in panel.groupby("ticker", sort=False)}
+
+
+# =====================================================================
+# 批量打分函数（整段历史一次计算，结果与逐日调用单点函数一致）
+# =====================================================================
+
+def calculate_technical_score_series(df_features: pd.DataFrame) -> pd.Series:
+    """
+    批量计算技术面分数，第i行等于 calculate_technical_score(df_features.iloc[:i+1])
+
+    Args:
+        df_features: 技术指标DataFrame（需包含 TECHNICAL_SCORE_COLUMNS）
+
+    Returns:
+        与df_features同索引的分数Series
+    """
+    values = [_float_values(df_features, column) for column in TECHNICAL_SCORE_COLUMNS]
+    return pd.Series(_technical_score_values(*values), index=df_features.index, dtype="float64")
+
+
+def calculate_institutional_score_series(
+    index: pd.Index,
+    df_trades: pd.DataFrame,
+    lookback_days: int = 35,
+    use_smart_money: bool = False
+) -> pd.Series:
+    """
+    批量计算机构流向分数
+
+    Args:
+        index: 评估日期索引
+        df_trades: 机构交易数据（全量，函数内部按日期截断）
+        lookback_days: 回看天数
+        use_smart_money: True=增强版(Smart Money), False=简单版(仅外资)
+
+    Returns:
+        与index同索引的分数Series
+    """
+    if df_trades.empty or "EnDate" not in df_trades.columns:
+        return pd.Series(50.0, index=index, dtype="float64")
+    if not use_smart_money and "FrgnBal" not in df_trades.columns:
+        return pd.Series(50.0, index=index, dtype="float64")
+
+    # assign 返回新表，不整表深拷贝也不改动调用方的 df_trades
+    local = df_trades.assign(EnDate=pd.to_datetime(df_trades["EnDate"], errors="coerce"))
+    local = local[local["EnDate"].notna()].sort_values("EnDate")
+    if local.empty:
+        return pd.Series(50.0, index=index, dtype="float64")
+    if use_smart_money:
+        return _smart_money_score_series(index, local, lookback_days)
+    local["FrgnBal"] = pd.to_numeric(local["FrgnBal"], errors="coerce")
+
+    # 外资净额与有效记录数的前缀和：窗口合计/均值 = 两次searchsorted + 相减
+    trade_dates = pd.DatetimeIndex(local["EnDate"])
+    frgn = local["FrgnBal"].to_numpy(dtype="float64", na_value=np.nan)
+    valid = ~np.isnan(frgn)
+    frgn_cs = np.concatenate(([0.0], np.cumsum(np.where(valid, frgn, 0.0))))
+    valid_cs = np.concatenate(([0], np.cumsum(valid)))
+
+    dates = pd.DatetimeIndex(index)
+    left = trade_dates.searchsorted(dates - pd.Timedelta(days=lookback_days), side="left")
+    right = trade_dates.searchsorted(dates, side="right")
+    has_window = right > left
+    net_foreign_flow = frgn_cs[right] - frgn_cs[left]
+    valid_count = valid_cs[right] - valid_cs[left]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_value = np.where(valid_count > 0, net_foreign_flow / valid_count, np.nan)
+    latest_value = frgn[np.maximum(right - 1, 0)]
+
+    score = 50.0 + np.select(
+        [net_foreign_flow > 0, net_foreign_flow < 0], [20.0, -15.0], 0.0
+    )
+    score += 10.0 * ((net_foreign_flow > 0) & (latest_value > mean_value))
+    values = np.where(has_window, np.clip(score, 0.0, 100.0), 50.0)
+    return pd.Series(values, index=index, dtype="float64")
+
+
+def calculate_fundamental_score_series(
+    index: pd.Index,
+    df_financials: pd.DataFrame
+) -> pd.Series:
+    """
+    批量计算基本面分数，每个日期只使用当日及之前披露的财报
+
+    Args:
+        index: 评估日期索引
+        df_financials: 财务数据（全量，函数内部按DiscDate截断）
+
+    Returns:
+        与index同索引的分数Series
+    """
+    if df_financials.empty or "DiscDate" not in df_financials.columns or len(df_financials) < 2:
+        return pd.Series(50.0, index=index, dtype="float64")
+
+    # assign 返回新表，不整表深拷贝也不改动调用方的 df_financials
+    local = df_financials.assign(DiscDate=pd.to_datetime(df_financials["DiscDate"], errors="coerce"))
+    local = local[local["DiscDate"].notna()].sort_values("DiscDate")
+    if len(local) < 2:
+        return pd.Series(50.0, index=index, dtype="float64")
+
+    # 每次披露只算一次（与上一期对比），评估日按披露日searchsorted取分
+    sales = _numeric_column(local, "Sales")
+    op = _numeric_column(local, "OperatingProfit")
+    disclosure_scores = _fundamental_score_values(
+        sales[1:],
+        sales[:-1],
+        op[1:],
+        op[:-1],
+        _numeric_column(local, "FSales")[1:],
+    )
+    right = pd.DatetimeIndex(local["DiscDate"]).searchsorted(pd.DatetimeIndex(index), side="right")
+    values = np.where(right >= 2, disclosure_scores[np.maximum(right - 2, 0)], 50.0)
+    return pd.Series(values, index=index, dtype="float64")
+
+
+# 基本面增长率分档（严格不等式）：上调阈值升序排列，searchsorted(side="left")
+# 得到严格小于增长率的阈值个数，即对应档位的加分下标
+_SALES_GROWTH_THRESHOLDS = np.array([5.0, 10.0])
+_SALES_GROWTH_POINTS = np.array([0.0, 10.0, 15.0])
+_OP_GROWTH_THRESHOLDS = np.array([8.0, 15.0])
+_OP_GROWTH_POINTS = np.array([0.0, 12.0, 20.0])
+
+
+def _growth_points(
+    current: np.ndarray,
+    previous: np.ndarray,
+    thresholds: np.ndarray,
+    points: np.ndarray,
+    decline_threshold: float,
+    decline_points: float
+) -> np.ndarray:
+    """增长率分档加减分；当前值缺失或上期值不为正时不计分"""
+    valid = ~np.isnan(current) & (previous > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = (current / previous - 1) * 100
+    tier_points = points[np.searchsorted(thresholds, growth, side="left")]
+    tier_points = np.where(growth < decline_threshold, decline_points, tier_points)
+    return np.where(valid, tier_points, 0.0)
+
+
+def _fundamental_score_values(
+    sales: np.ndarray,
+    prev_sales: np.ndarray,
+    op: np.ndarray,
+    prev_op: np.ndarray,
+    forecast_sales: np.ndarray
+) -> np.ndarray:
+    """calculate_fundamental_score 的向量化版本（逐元素对应一组 最新/上期 财报）"""
+    score = (
+        50.0
+        + _growth_points(sales, prev_sales, _SALES_GROWTH_THRESHOLDS, _SALES_GROWTH_POINTS, -5.0, -15.0)
+        + _growth_points(op, prev_op, _OP_GROWTH_THRESHOLDS, _OP_GROWTH_POINTS, -10.0, -20.0)
+    )
+    with np.errstate(invalid="ignore"):
+        beat = (
+            ~np.isnan(sales)
+            & (forecast_sales > 0)
+            & (sales > forecast_sales * 1.03)
+        )
+    score = score + 15.0 * beat
+    return np.clip(score, 0.0, 100.0)
+
+
+def _numeric_column(df: pd.DataFrame, column: str) -> np.ndarray:
+    """列转float数组（缺列按0，无法解析按NaN，与 _to_float(row.get(col, 0)) 一致）"""
+    if column not in df.columns:
+        return np.zeros(len(df))
+    return _float_values(df, column)
+
+
+def calculate_volatility_score_series(df_features: pd.DataFrame) -> pd.Series:
+    """
+    批量计算波动性分数（前19行不足20天，固定为50）
+
+    Args:
+        df_features: 技术指标DataFrame（需包含 ATR_Z_60 或 ATR）
+
+    Returns:
+        与df_features同索引的分数Series
+    """
+    if "ATR_Z_60" in df_features.columns:
+        atr_zscore = pd.to_numeric(df_features["ATR_Z_60"], errors="coerce")
+    else:
+        atr_zscore = pd.Series(np.nan, index=df_features.index, dtype="float64")
+
+    if "ATR" in df_features.columns:
+        atr = pd.to_numeric(df_features["ATR"], errors="coerce")
+        atr_avg = atr.rolling(window=60, min_periods=1).mean()
+        atr_std = atr.rolling(window=60, min_periods=1).std()
+        fallback_zscore = (atr - atr_avg) / atr_std.where(atr_std > 0)
+        atr_zscore = atr_zscore.where(atr_zscore.notna(), fallback_zscore)
+
+    values = atr_zscore.to_numpy(dtype="float64", na_value=np.nan, copy=True)
+    values[:19] = np.nan
+    return pd.Series(_volatility_score_values(values), index=df_features.index, dtype="float64")
+
+
+def _smart_money_score_series(
+    index: pd.Index,
+    trades: pd.DataFrame,
+    lookback_days: int
+) -> pd.Series:
+    """增强版机构分数：各窗口合计与最近/之前7条合计都由前缀和O(1)取得"""
+    trade_dates = pd.DatetimeIndex(trades["EnDate"])
+    smart_cs = np.concatenate(([0.0], np.cumsum(_row_flows(trades, SMART_MONEY_COLUMNS))))
+    dumb_cs = np.concatenate(([0.0], np.cumsum(_row_flows(trades, DUMB_MONEY_COLUMNS))))
+
+    dates = pd.DatetimeIndex(index)
+    left = trade_dates.searchsorted(dates - pd.Timedelta(days=lookback_days), side="left")
+    right = trade_dates.searchsorted(dates, side="right")
+    count = right - left
+
+    smart_flow = smart_cs[right] - smart_cs[left]
+    dumb_flow = dumb_cs[right] - dumb_cs[left]
+    score = 50.0 + np.select([smart_flow > 0, smart_flow < 0], [25.0, -15.0], 0.0)
+    score += 15.0 * ((smart_flow > 0) & (dumb_flow < 0))
+
+    mid = np.maximum(right - 7, 0)
+    early = np.maximum(right - 14, 0)
+    accelerating = (smart_cs[right] - smart_cs[mid]) > (smart_cs[mid] - smart_cs[early])
+    score += 10.0 * ((count >= 14) & accelerating)
+
+    score = np.where(count > 0, np.clip(score, 0.0, 100.0), 50.0)
+    return pd.Series(score, index=index, dtype="float64")
+
+
+def _row_flows(trades: pd.DataFrame, columns, rows: slice = slice(None)) -> np.ndarray:
+    """逐行合计给定投资主体列的净额（缺列忽略，NaN按0计），rows限定只算窗口内的行"""
+    # 逐列取float数组累加：不构造子表、不走 DataFrame.apply；与 nansum(axis=1) 同序相加
+    flows = np.zeros(len(range(*rows.indices(len(trades)))))
+    for column in columns:
+        if column in trades.columns:
+            values = _float_values(trades, column)[rows]
+            flows += np.where(np.isnan(values), 0.0, values)
+    return flows
+
+
+def _nanmean_or_nan(values: np.ndarray) -> float:
+    finite_values = values[~np.isnan(values)]
+    if len(finite_values) == 0:
+        return float("nan")
+    return float(finite_values.mean())
+
+
+def _to_float(value) -> float:
+    """标量转float，无法转换时返回NaN（比 pd.to_numeric 的标量路径轻得多）"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
 # =====================================================================
 # 辅助检测函数
 # =====================================================================
 
+# 加载元数据时预解析的财报日期（排序后的 datetime64[D] 数组）
+EARNINGS_DATES_KEY = '_earnings_dates'
+
+_NS_PER_DAY = 86_400_000_000_000
+
+
+def prepare_earnings_dates(metadata: dict) -> dict:
+    """
+    把 earnings_calendar 一次性解析为排序后的日期数组，放入 EARNINGS_DATES_KEY
+
+    在加载元数据时调用一次，之后 check_earnings_risk 每个bar只做一次二分查找，
+    不再逐事件调用 pd.to_datetime。
+
+    Args:
+        metadata: 元数据（不会被修改）
+
+    Returns:
+        含预解析字段的新字典（浅拷贝）；没有 earnings_calendar 时原样返回。
+        传入的字典保持可JSON序列化，不会被写入ndarray。
+    """
+    if metadata and 'earnings_calendar' in metadata:
+        return {
+            **metadata,
+            EARNINGS_DATES_KEY: _parse_earnings_dates(metadata['earnings_calendar']),
+        }
+    return metadata
+
+
+def _parse_earnings_dates(events) -> np.ndarray:
+    events = list(events or [])
+    raw = [event.get('Date') if isinstance(event, dict) else None for event in events]
+    if raw and all(isinstance(value, str) and len(value) == 10 for value in raw):
+        # J-Quants的 YYYY-MM-DD 日期整列交给numpy解析；任一无法解析时退回逐条路径
+        try:
+            return np.sort(np.array(raw, dtype='datetime64[D]'))
+        except ValueError:
+            pass
+    
+    dates = []
+    for event in events:
+        try:
+            evt_date = pd.Timestamp(event['Date'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if pd.isna(evt_date):
+            continue
+        if evt_date.tzinfo is not None:
+            evt_date = evt_date.tz_localize(None)
+        dates.append(evt_date.to_datetime64())
+    return np.sort(np.array(dates, dtype='datetime64[D]'))
+
+
 def check_earnings_risk(
     metadata: dict,
     current_date: pd.Timestamp
@@ -330,25 +998,29 @@ def check_earnings_risk(
     检查财报风险
     
     Args:
-        metadata: 元数据（含earnings_calendar）
+        metadata: 元数据（含earnings_calendar，最好已经过 prepare_earnings_dates）
         current_date: 当前日期
         
     Returns:
         (has_risk, days_until_earnings)
         - has_risk: True if 7天内有财报
-        - days_until_earnings: 距离财报天数（999表示无近期财报）
+        - days_until_earnings: 距离最近一次未来财报的天数（999表示无近期财报）
     """
     if not metadata or 'earnings_calendar' not in metadata:
         return False, 999
     
-    for event in metadata['earnings_calendar']:
-        try:
-            evt_date = pd.to_datetime(event['Date'])
-            delta = (evt_date - current_date).days
-            if 0 <= delta <= 7:
-                return True, delta
-        except:
-            continue
+    earnings_dates = metadata.get(EARNINGS_DATES_KEY)
+    if earnings_dates is None:
+        earnings_dates = _parse_earnings_dates(metadata['earnings_calendar'])
+    
+    # datetime64[D] 按int64天数视图比较，避免逐次构造datetime64/Timedelta
+    earnings_days = earnings_dates.view(np.int64)
+    current_day = pd.Timestamp(current_date).value // _NS_PER_DAY
+    pos = int(np.searchsorted(earnings_days, current_day, side='left'))
+    if pos < len(earnings_days):
+        delta = int(earnings_days[pos]) - current_day
+        if delta <= 7:
+            return True, delta
     
     return False, 999
 
@@ -371,23 +1043,90 @@ def detect_institutional_exodus(
     Returns:
         True if 检测到机构大举卖出
     """
-    if df_trades.empty:
+    if df_trades.empty or 'FrgnBal' not in df_trades.columns:
         return False
     
-    df_trades = df_trades.copy()
-    df_trades['EnDate'] = pd.to_datetime(df_trades['EnDate'])
+    # 只在FrgnBal数组上按窗口取值求和，不切出窗口子表
+    recent_flows = _float_values(df_trades, 'FrgnBal')[
+        _window_rows(df_trades, current_date, window_days)
+    ]
     
-    start_date = current_date - timedelta(days=window_days)
-    recent = df_trades[(df_trades['EnDate'] > start_date) & 
-                       (df_trades['EnDate'] <= current_date)]
-    
-    if recent.empty or 'FrgnBal' not in recent.columns:
+    if len(recent_flows) == 0:
         return False
     
-    net_foreign = recent['FrgnBal'].sum()
+    net_foreign = np.nansum(recent_flows)
     return net_foreign < threshold
 
 
+def _trade_window(
+    df_trades: pd.DataFrame,
+    end_date: pd.Timestamp,
+    days: int,
+    include_start: bool = False
+) -> Tuple[pd.DataFrame, int, int]:
+    """
+    返回 (按EnDate升序的交易表, 窗口起始行, 窗口结束行)，窗口同 _trades_in_window
+
+    已按日期升序时原表直接返回、只二分出行区间，调用方按列数组切片；
+    乱序时退回掩码过滤后排序，行区间为整张结果表。
+    """
+    rows = _window_rows(df_trades, end_date, days, include_start=include_start)
+    if isinstance(rows, slice):
+        return df_trades, rows.start, rows.stop
+    recent = df_trades[rows]
+    if not recent['EnDate'].is_monotonic_increasing:
+        recent = recent.sort_values('EnDate')
+    return recent, 0, len(recent)
+
+
+def _window_bounds(end_date: pd.Timestamp, days: int) -> Tuple[np.datetime64, np.datetime64]:
+    """(end_date - days, end_date) 的纳秒datetime64边界，按整数计算不做 Timestamp - timedelta"""
+    end_ns = pd.Timestamp(end_date).value
+    return np.datetime64(end_ns - days * _NS_PER_DAY, 'ns'), np.datetime64(end_ns, 'ns')
+
+
+def _trades_in_window(
+    df_trades: pd.DataFrame,
+    end_date: pd.Timestamp,
+    days: int,
+    include_start: bool = False
+) -> pd.DataFrame:
+    """
+    取 EnDate 落在 (end_date - days, end_date] 的行（include_start=True 时为闭区间）
+
+    不复制整表：行选择见 _window_rows。
+    """
+    rows = _window_rows(df_trades, end_date, days, include_start=include_start)
+    if isinstance(rows, slice):
+        return df_trades.iloc[rows]
+    return df_trades[rows]
+
+
+def _window_rows(
+    df_trades: pd.DataFrame,
+    end_date: pd.Timestamp,
+    days: int,
+    include_start: bool = False
+) -> Union[slice, np.ndarray]:
+    """
+    窗口内行的选择器：已按EnDate升序时为二分得到的行切片，否则为numpy布尔掩码
+
+    EnDate已是datetime时不再解析；窗口边界按纳秒整数计算，不做 Timestamp - timedelta。
+    调用方可直接用于列数组（values[rows]）或 DataFrame 取行。
+    """
+    start, end = _window_bounds(end_date, days)
+    en_dates = df_trades['EnDate']
+    if not pd.api.types.is_datetime64_any_dtype(en_dates):
+        en_dates = pd.to_datetime(en_dates)
+    values = en_dates.to_numpy()
+    if en_dates.is_monotonic_increasing:
+        left = values.searchsorted(start, side='left' if include_start else 'right')
+        right = values.searchsorted(end, side='right')
+        return slice(int(left), int(right))
+    after_start = values >= start if include_start else values > start
+    return after_start & (values <= end)
+
+
 def detect_trend_breakdown(df_features: pd.DataFrame) -> Optional[str]:
     """
     检测趋势破坏（多信号确认）
@@ -408,40 +1147,38 @@ def detect_trend_breakdown(df_features: pd.DataFrame) -> Optional[str]:
     if len(df_features) < 5:
         return None
     
-    latest = df_features.iloc[-1]
+    # 最多回看20行，一次抽出各列尾部，逐项按下标取标量
+    view = FeatureView.from_df(df_features, tail=20)
     signals = []
     
     # 1. 跌破EMA200（确认不是假突破）
-    if latest['Close'] < latest['EMA_200']:
-        closes_below = (df_features['Close'].tail(3) < df_features['EMA_200'].tail(3)).sum()
+    if view.close[-1] < view.ema200[-1]:
+        closes_below = (view.close[-3:] < view.ema200[-3:]).sum()
         if closes_below >= 2:
             signals.append("Below EMA200")
     
     # 2. MACD死叉
-    if len(df_features) >= 2:
-        macd_hist_prev = df_features.iloc[-2]['MACD_Hist']
-        macd_hist_now = latest['MACD_Hist']
-        if macd_hist_prev > 0 and macd_hist_now < 0:
-            signals.append("MACD death cross")
+    if view.macd_hist[-2] > 0 and view.macd_hist[-1] < 0:
+        signals.append("MACD death cross")
     
     # 3. RSI持续弱势
-    if latest['RSI'] < 40:
-        rsi_weak = (df_features['RSI'].tail(5) < 45).sum()
+    if view.rsi[-1] < 40:
+        rsi_weak = (view.rsi[-5:] < 45).sum()
         if rsi_weak >= 4:
             signals.append("Persistent RSI weakness")
     
     # 4. 成交量萎缩 + 价格下跌
     if len(df_features) >= 20:
-        volume_avg = latest.get('Volume_SMA_20', np.nan)
-        if pd.isna(volume_avg):
-            volume_avg = df_features['Volume'].tail(20).mean()
+        volume_avg = view.volume_sma[-1]
+        if math.isnan(volume_avg):
+            volume_avg = _nanmean_or_nan(view.volume)
 
-        if latest['Volume'] < volume_avg * 0.7:
-            return_5d = latest.get('Return_5d', np.nan)
-            if pd.notna(return_5d):
+        if view.volume[-1] < volume_avg * 0.7:
+            return_5d = view.return_5d[-1]
+            if not math.isnan(return_5d):
                 price_change_5d = return_5d * 100
             else:
-                price_change_5d = (latest['Close'] / df_features.iloc[-6]['Close'] - 1) * 100
+                price_change_5d = (view.close[-1] / view.close[-6] - 1) * 100
             if price_change_5d < -3:
                 signals.append("Volume dry-up")
     
@@ -452,6 +1189,129 @@ def detect_trend_breakdown(df_features: pd.DataFrame) -> Optional[str]:
     return None
 
 
+def detect_trend_breakdown_series(df_features: pd.DataFrame) -> pd.Series:
+    """
+    批量版 detect_trend_breakdown
+
+    第i行等于 detect_trend_breakdown(df_features.iloc[:i+1])，
+    供需要逐bar结果的策略一次性预计算。
+
+    Args:
+        df_features: 技术指标DataFrame
+
+    Returns:
+        与df_features同索引的object Series，值为破坏信号描述或None
+    """
+    n = len(df_features)
+    result = np.full(n, None, dtype=object)
+    if n < 5:
+        return pd.Series(result, index=df_features.index, dtype=object)
+
+    close = _float_values(df_features, 'Close')
+    ema200 = _float_values(df_features, 'EMA_200')
+    macd_hist = _float_values(df_features, 'MACD_Hist')
+    rsi = _float_values(df_features, 'RSI')
+    rows = np.arange(n)
+
+    # 1. 跌破EMA200（最近3天至少2天收于EMA200下方）
+    below = close < ema200
+    below_ema200 = below & (_rolling_true_count(below, 3) >= 2)
+
+    # 2. MACD死叉
+    prev_hist = np.concatenate(([np.nan], macd_hist[:-1]))
+    death_cross = (prev_hist > 0) & (macd_hist < 0)
+
+    # 3. RSI持续弱势
+    rsi_weak = (rsi < 40) & (_rolling_true_count(rsi < 45, 5) >= 4)
+
+    # 4. 成交量萎缩 + 价格下跌
+    volume_dry = np.zeros(n, dtype=bool)
+    if n >= 20:
+        volume = _float_values(df_features, 'Volume')
+        if 'Volume_SMA_20' in df_features.columns:
+            volume_avg = _float_values(df_features, 'Volume_SMA_20')
+        else:
+            volume_avg = np.full(n, np.nan)
+        filled = np.where(np.isnan(volume), 0.0, volume)
+        windows = np.lib.stride_tricks.sliding_window_view(filled, 20).sum(axis=1)
+        counts = np.lib.stride_tricks.sliding_window_view(~np.isnan(volume), 20).sum(axis=1)
+        tail_mean = np.full(n, np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            tail_mean[19:] = np.where(counts > 0, windows / counts, np.nan)
+        volume_avg = np.where(np.isnan(volume_avg), tail_mean, volume_avg)
+
+        if 'Return_5d' in df_features.columns:
+            return_5d = _float_values(df_features, 'Return_5d')
+        else:
+            return_5d = np.full(n, np.nan)
+        close_5d_ago = np.concatenate((np.full(5, np.nan), close[:-5]))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            fallback_change = (close / close_5d_ago - 1) * 100
+        price_change_5d = np.where(np.isnan(return_5d), fallback_change, return_5d * 100)
+        volume_dry = (rows >= 19) & (volume < volume_avg * 0.7) & (price_change_5d < -3)
+
+    labels = ("Below EMA200", "MACD death cross", "Persistent RSI weakness", "Volume dry-up")
+    hits = np.vstack((below_ema200, death_cross, rsi_weak, volume_dry))
+    hits[:, :4] = False
+
+    # 需要至少2个信号
+    for row in np.flatnonzero(hits.sum(axis=0) >= 2):
+        result[row] = " AND ".join(
+            label for label, hit in zip(labels, hits[:, row]) if hit
+        )
+    return pd.Series(result, index=df_features.index, dtype=object)
+
+
+class FeatureView(NamedTuple):
+    """
+    逐行检测用到的指标列（float64 ndarray）
+
+    from_df 只做一次列抽取，之后按下标取标量，
+    避免 df.iloc[i] 为每次取值构造整行Series。可选列缺失时填NaN。
+    """
+    close: np.ndarray
+    ema200: np.ndarray
+    rsi: np.ndarray
+    macd_hist: np.ndarray
+    volume: np.ndarray
+    volume_sma: np.ndarray
+    return_5d: np.ndarray
+
+    @classmethod
+    def from_df(cls, df: pd.DataFrame, tail: Optional[int] = None) -> 'FeatureView':
+        # 直接在原表上取列再切ndarray尾部：省去 df.iloc[-tail:] 构造子表
+        rows = slice(None) if tail is None else slice(-tail, None)
+        return cls(
+            close=_float_values(df, 'Close')[rows],
+            ema200=_float_values(df, 'EMA_200')[rows],
+            rsi=_float_values(df, 'RSI')[rows],
+            macd_hist=_float_values(df, 'MACD_Hist')[rows],
+            volume=_optional_float_values(df, 'Volume')[rows],
+            volume_sma=_optional_float_values(df, 'Volume_SMA_20')[rows],
+            return_5d=_optional_float_values(df, 'Return_5d')[rows],
+        )
+
+
+def _optional_float_values(df: pd.DataFrame, column: str) -> np.ndarray:
+    if column not in df.columns:
+        return np.full(len(df), np.nan)
+    return _float_values(df, column)
+
+
+def _float_values(df: pd.DataFrame, column: str) -> np.ndarray:
+    series = df[column]
+    # 已是数值列时直接取数组，只有object/字符串列才需要 pd.to_numeric 解析
+    if not pd.api.types.is_numeric_dtype(series.dtype):
+        series = pd.to_numeric(series, errors='coerce')
+    return series.to_numpy(dtype='float64', na_value=np.nan)
+
+
+def _rolling_true_count(mask: np.ndarray, window: int) -> np.ndarray:
+    counts = np.cumsum(mask, dtype=np.int64)
+    counts[window:] = counts[window:] - counts[:-window]
+    return counts
+
+
 def detect_market_deterioration(
     entry_data: pd.Series,
     current_data: pd.Series,
@@ -478,6 +1338,43 @@ def detect_market_deterioration(
         恶化信号描述，None表示无明显恶化
         需要至少2个维度恶化才确认
     """
+    entry_foreign = None
+    current_foreign = None
+    
+    # 机构流向（入场前一个月 vs 当前一个月）
+    if not df_trades.empty:
+        # 入场前一个月
+        entry_month = _trades_in_window(df_trades, entry_date, 30)
+        # 当前一个月
+        current_month = _trades_in_window(df_trades, current_date, 30)
+        
+        if not entry_month.empty and not current_month.empty:
+            entry_foreign = entry_month['FrgnBal'].sum()
+            current_foreign = current_month['FrgnBal'].sum()
+    
+    return market_deterioration_message(
+        entry_data, current_data, entry_foreign, current_foreign
+    )
+
+
+def market_deterioration_message(
+    entry_data,
+    current_data,
+    entry_foreign: Optional[float],
+    current_foreign: Optional[float]
+) -> Optional[str]:
+    """
+    根据入场/当前指标和外资净流向判定市场恶化
+
+    Args:
+        entry_data: 入场时的技术指标（支持 ['Close'] 取值）
+        current_data: 当前技术指标
+        entry_foreign: 入场前30天外资净额，None表示窗口内无数据
+        current_foreign: 当前30天外资净额，None表示窗口内无数据
+
+    Returns:
+        恶化信号描述，None表示无明显恶化
+    """
     issues = []
     
     # 1. 趋势反转
@@ -488,29 +1385,10 @@ def detect_market_deterioration(
     if entry_data['MACD_Hist'] > 0 and current_data['MACD_Hist'] < 0:
         issues.append("Momentum lost")
     
-    # 3. 机构流向恶化
-    if not df_trades.empty:
-        df_trades = df_trades.copy()
-        df_trades['EnDate'] = pd.to_datetime(df_trades['EnDate'])
-        
-        # 入场前一个月
-        entry_month = df_trades[
-            (df_trades['EnDate'] > entry_date - timedelta(days=30)) &
-            (df_trades['EnDate'] <= entry_date)
-        ]
-        # 当前一个月
-        current_month = df_trades[
-            (df_trades['EnDate'] > current_date - timedelta(days=30)) &
-            (df_trades['EnDate'] <= current_date)
-        ]
-        
-        if not entry_month.empty and not current_month.empty:
-            entry_foreign = entry_month['FrgnBal'].sum()
-            current_foreign = current_month['FrgnBal'].sum()
-            
-            # 从买入转为大举卖出
-            if entry_foreign > 0 and current_foreign < -30_000_000:
-                issues.append("Foreign reversal")
+    # 3. 机构流向恶化：从买入转为大举卖出
+    if entry_foreign is not None and current_foreign is not None:
+        if entry_foreign > 0 and current_foreign < -30_000_000:
+            issues.append("Foreign reversal")
     
     # 需要至少2个维度恶化
     if len(issues) >= 2:
@@ -17,7 +17,7 @@ class SignalAction(Enum):
     HOLD = "HOLD"
 
 
-@dataclass
+@dataclass(slots=True)
 class TradingSignal:
     """
     统一的交易信号
@@ -46,7 +46,7 @@ class TradingSignal:
         return self.__str__()
 
 
-@dataclass
+@dataclass(slots=True)
 class MarketData:
     """
     封装所有市场数据
@@ -73,7 +73,8 @@ class MarketData:
         """当前价格"""
         if self.df_features.empty:
             return 0.0
-        return self.df_features.iloc[-1]['Close']
+        # 只读Close单元格：iloc[-1] 会为整行（混合dtype时走object）构造Series
+        return self.df_features.iat[-1, self.df_features.columns.get_loc('Close')]
     
     @property
     def latest_features(self) -> pd.Series:
@@ -87,7 +88,7 @@ class MarketData:
                 f"price=¥{self.latest_price:,.0f})")
 
 
-@dataclass
+@dataclass(slots=True)
 class Position:
     """
     持仓信息
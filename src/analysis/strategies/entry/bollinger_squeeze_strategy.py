@@ -144,9 +144,6 @@ class BollingerSqueezeStrategy(BaseEntryStrategy):
                 strategy_name="BollingerSqueezeStrategy"
             )
         
-        latest = df.iloc[-1]
-        prev = df.iloc[-2]
-        
         # 检查必要字段
         required_fields = ['BB_Width', 'BB_PctB', 'ADX_14', 'Volume', 'Volume_SMA_20', 'Close']
         if not all(field in df.columns for field in required_fields):
@@ -157,12 +154,15 @@ class BollingerSqueezeStrategy(BaseEntryStrategy):
                 strategy_name="BollingerSqueezeStrategy"
             )
         
+        latest = df.iloc[-1]
+        prev = df.iloc[-2]
+        
         reasons = []
         confidence = 0.0
         
-        # 1. 布林带宽度挤压检测
-        bb_width_series = df['BB_Width'].dropna()
-        if len(bb_width_series) < 20:
+        # 1. 布林带宽度挤压检测（count()只计数非空值，不复制整列）
+        bb_width = df['BB_Width']
+        if bb_width.count() < 20:
             return TradingSignal(
                 action=SignalAction.HOLD,
                 confidence=0.0,
@@ -172,16 +172,20 @@ class BollingerSqueezeStrategy(BaseEntryStrategy):
         
         squeeze_threshold = latest.get('BB_Width_Q20_100')
         if pd.isna(squeeze_threshold):
-            squeeze_threshold = np.percentile(bb_width_series.tail(100), self.squeeze_percentile)
+            bb_width_values = bb_width.to_numpy(dtype='float64', na_value=np.nan)
+            bb_width_values = bb_width_values[~np.isnan(bb_width_values)]
+            squeeze_threshold = np.percentile(bb_width_values[-100:], self.squeeze_percentile)
         is_squeezed = latest['BB_Width'] < squeeze_threshold
         
         # 2. 突破上轨检测
         breakout_upper = latest['BB_PctB'] > 1.0 and prev['BB_PctB'] <= 1.0
         
-        # 3. 成交量放大
+        # 3. 成交量放大（量比只算一次，理由文本与metadata共用）
+        volume_sma_valid = pd.notna(latest['Volume_SMA_20'])
+        volume_ratio = latest['Volume'] / latest['Volume_SMA_20'] if volume_sma_valid else None
         volume_surge = (
             pd.notna(latest['Volume']) and 
-            pd.notna(latest['Volume_SMA_20']) and 
+            volume_sma_valid and 
             latest['Volume'] > self.volume_multiplier * latest['Volume_SMA_20']
         )
         
@@ -203,7 +207,7 @@ class BollingerSqueezeStrategy(BaseEntryStrategy):
                 confidence += 0.2
         
         if volume_surge:
-            reasons.append(f"成交量放大（{latest['Volume']/latest['Volume_SMA_20']:.2f}x）")
+            reasons.append(f"成交量放大（{volume_ratio:.2f}x）")
             confidence += 0.2
         
         if adx_confirmed:
@@ -227,7 +231,7 @@ class BollingerSqueezeStrategy(BaseEntryStrategy):
                 "bb_width": float(latest['BB_Width']),
                 "bb_pctb": float(latest['BB_PctB']),
                 "adx": float(latest['ADX_14']) if pd.notna(latest['ADX_14']) else 0.0,
-                "volume_ratio": float(latest['Volume'] / latest['Volume_SMA_20']) if pd.notna(latest['Volume_SMA_20']) else 0.0,
+                "volume_ratio": float(volume_ratio) if volume_sma_valid else 0.0,
                 "is_squeezed": is_squeezed,
                 "breakout": breakout_upper
             },
@@ -240,19 +244,28 @@ def _rolling_non_null_percentile(
     *,
     percentile: float,
     window: int,
+    min_history: int = 20,
 ) -> tuple[pd.Series, pd.Series]:
-    history: list[float] = []
-    thresholds: list[float] = []
-    counts: list[int] = []
-    for value in pd.to_numeric(series, errors='coerce'):
-        if pd.notna(value):
-            history.append(float(value))
-        counts.append(len(history))
-        if len(history) >= 20:
-            thresholds.append(float(np.percentile(history[-window:], percentile)))
-        else:
-            thresholds.append(np.nan)
+    """
+    每行截至当日最近window个非空值的百分位（非空值不足min_history时为NaN）及非空计数
+
+    结果与逐行 np.percentile(history[-window:], percentile) 相同：满窗部分用
+    sliding_window_view 一次按行求百分位，未满窗的前几十行逐个计算。
+    """
+    values = pd.to_numeric(series, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    valid = ~np.isnan(values)
+    history = values[valid]
+    counts = np.cumsum(valid)
+
+    # 按“已有非空值个数”索引的阈值表，再按每行的计数取值
+    by_count = np.full(len(history) + 1, np.nan)
+    for count in range(min_history, min(window, len(history) + 1)):
+        by_count[count] = np.percentile(history[:count], percentile)
+    first_full = max(window, min_history)
+    if len(history) >= first_full:
+        windows = np.lib.stride_tricks.sliding_window_view(history[first_full - window:], window)
+        by_count[first_full:] = np.percentile(windows, percentile, axis=1)
     return (
-        pd.Series(thresholds, index=series.index, dtype='float64'),
+        pd.Series(by_count[counts], index=series.index, dtype='float64'),
         pd.Series(counts, index=series.index, dtype='int64'),
     )
@@ -4,6 +4,8 @@ from __future__ import annotations
 
 import math
 
+import numpy as np
+
 
 def safe_float(value: object) -> float | None:
     """Return a finite float or None for missing/unusable values."""
@@ -37,6 +39,43 @@ def crossed_up(
     return fast_prev_float <= slow_prev_float and fast_now_float > slow_now_float
 
 
+def golden_cross_mask(hist: object) -> np.ndarray:
+    """Return a bool mask of bars where a histogram turns from < 0 to > 0.
+
+    Row i is True when ``hist[i - 1] < 0 and hist[i] > 0``; the first row and
+    any comparison involving NaN are False, matching the per-bar check.
+    """
+    values = np.asarray(hist, dtype=float)
+    mask = np.zeros(len(values), dtype=bool)
+    if len(values) > 1:
+        mask[1:] = (values[:-1] < 0) & (values[1:] > 0)
+    return mask
+
+
+def golden_cross_last(hist: np.ndarray) -> bool:
+    """Return True when the last two histogram values go from < 0 to > 0.
+
+    NaN on either bar compares False, so missing values never trigger.
+    """
+    if len(hist) < 2:
+        return False
+    return bool(hist[-2] < 0 and hist[-1] > 0)
+
+
+def tail_rise(values: object, days: int) -> tuple[bool, float]:
+    """Return (rising, slope) over the last ``days`` values.
+
+    rising is True when every non-NaN step in the window is positive; slope is
+    last minus first. Both are (False, 0.0) with fewer than two values.
+    """
+    recent = np.asarray(values, dtype=float)[-days:]
+    if len(recent) < 2:
+        return False, 0.0
+    diffs = np.diff(recent)
+    rising = bool((diffs[~np.isnan(diffs)] > 0).all())
+    return rising, float(recent[-1] - recent[0])
+
+
 def gt_latest(left: object, right: object) -> bool:
     """Return True when both latest values are finite and left > right."""
     left_float = safe_float(left)
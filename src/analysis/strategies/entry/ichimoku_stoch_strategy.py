@@ -68,7 +68,7 @@ class IchimokuStochStrategy(BaseEntryStrategy):
         stoch_d = pd.to_numeric(features['Stoch_D'], errors='coerce')
 
         cloud_has_values = span_a.notna() & span_b.notna()
-        cloud_top = pd.concat([span_a, span_b], axis=1).max(axis=1)
+        cloud_top = np.fmax(span_a, span_b)
         cloud_top = cloud_top.where(cloud_has_values, close)
         above_cloud = close > cloud_top
         cloud_bullish = (span_a > span_b) & cloud_has_values
@@ -141,9 +141,6 @@ class IchimokuStochStrategy(BaseEntryStrategy):
                 strategy_name="IchimokuStochStrategy"
             )
         
-        latest = df.iloc[-1]
-        prev = df.iloc[-2]
-        
         # 检查必要字段
         required_fields = ['Close', 'Ichi_SpanA', 'Ichi_SpanB', 'Stoch_K', 'Stoch_D', 'OBV']
         if not all(field in df.columns for field in required_fields):
@@ -154,28 +151,40 @@ class IchimokuStochStrategy(BaseEntryStrategy):
                 strategy_name="IchimokuStochStrategy"
             )
         
+        latest = df.iloc[-1]
+        prev = df.iloc[-2]
+        
         reasons = []
         confidence = 0.0
         
-        # 1. 云层位置判断
-        cloud_top = max(latest['Ichi_SpanA'], latest['Ichi_SpanB']) if pd.notna(latest['Ichi_SpanA']) and pd.notna(latest['Ichi_SpanB']) else latest['Close']
-        cloud_bottom = min(latest['Ichi_SpanA'], latest['Ichi_SpanB']) if pd.notna(latest['Ichi_SpanA']) and pd.notna(latest['Ichi_SpanB']) else latest['Close']
+        # 1. 云层位置判断（两条先行线的缺失检查只做一次）
+        span_a = latest['Ichi_SpanA']
+        span_b = latest['Ichi_SpanB']
+        cloud_has_values = pd.notna(span_a) and pd.notna(span_b)
+        if cloud_has_values:
+            cloud_top = max(span_a, span_b)
+            cloud_bottom = min(span_a, span_b)
+            cloud_bullish = span_a > span_b
+        else:
+            cloud_top = cloud_bottom = latest['Close']
+            cloud_bullish = False
         
         above_cloud = latest['Close'] > cloud_top
-        cloud_bullish = latest['Ichi_SpanA'] > latest['Ichi_SpanB'] if pd.notna(latest['Ichi_SpanA']) and pd.notna(latest['Ichi_SpanB']) else False
         
         # 2. KDJ金叉检测
         k_cur = latest['Stoch_K']
         d_cur = latest['Stoch_D']
         k_prev = prev['Stoch_K']
         d_prev = prev['Stoch_D']
+        k_valid = pd.notna(k_cur)
+        d_valid = pd.notna(d_cur)
         
         stoch_crossover = (
-            pd.notna(k_cur) and pd.notna(d_cur) and
+            k_valid and d_valid and
             pd.notna(k_prev) and pd.notna(d_prev) and
             k_prev < d_prev and k_cur > d_cur
         )
-        stoch_oversold = k_cur < self.stoch_oversold if pd.notna(k_cur) else False
+        stoch_oversold = k_cur < self.stoch_oversold if k_valid else False
         
         # 3. OBV趋势判断
         if self.obv_lookback == 10 and 'OBV_Slope_10' in df.columns:
@@ -185,9 +194,8 @@ class IchimokuStochStrategy(BaseEntryStrategy):
             obv_slope = latest.get('OBV_Slope_20', 0)
             obv_rising = pd.notna(obv_slope) and obv_slope > 0
         else:
-            obv_series = df['OBV'].dropna()
-            if len(obv_series) >= self.obv_lookback:
-                obv_slope = (obv_series.iloc[-1] - obv_series.iloc[-self.obv_lookback]) / self.obv_lookback
+            obv_slope = _tail_slope(_obv_values(df), self.obv_lookback)
+            if obv_slope is not None:
                 obv_rising = obv_slope > 0
             else:
                 obv_rising = False
@@ -244,8 +252,8 @@ class IchimokuStochStrategy(BaseEntryStrategy):
                 "cloud_bottom": float(cloud_bottom),
                 "above_cloud": above_cloud,
                 "cloud_bullish": cloud_bullish,
-                "stoch_k": float(k_cur) if pd.notna(k_cur) else 0.0,
-                "stoch_d": float(d_cur) if pd.notna(d_cur) else 0.0,
+                "stoch_k": float(k_cur) if k_valid else 0.0,
+                "stoch_d": float(d_cur) if d_valid else 0.0,
                 "stoch_crossover": stoch_crossover,
                 "obv_slope": float(obv_slope)
             },
@@ -259,13 +267,30 @@ def _obv_slope_series(features: pd.DataFrame, lookback: int) -> pd.Series:
     if lookback == 20 and 'OBV_Slope_20' in features.columns:
         return pd.to_numeric(features['OBV_Slope_20'], errors='coerce')
 
-    history: list[float] = []
-    slopes: list[float] = []
-    for value in pd.to_numeric(features['OBV'], errors='coerce'):
-        if pd.notna(value):
-            history.append(float(value))
-        if len(history) >= lookback:
-            slopes.append((history[-1] - history[-lookback]) / lookback)
-        else:
-            slopes.append(0.0)
-    return pd.Series(slopes, index=features.index, dtype='float64')
+    # 第i行的斜率 = 截至i的最近lookback个非空OBV首尾差 / lookback（不足时为0）
+    values = _obv_values(features)
+    history = values[~np.isnan(values)]
+    counts = np.cumsum(~np.isnan(values))
+    by_count = np.zeros(len(history) + 1)
+    if len(history) >= lookback:
+        by_count[lookback:] = (history[lookback - 1:] - history[: len(history) - lookback + 1]) / lookback
+    return pd.Series(by_count[counts], index=features.index, dtype='float64')
+
+
+def _obv_values(features: pd.DataFrame) -> np.ndarray:
+    return pd.to_numeric(features['OBV'], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+
+def _tail_slope(values: np.ndarray, lookback: int) -> Optional[float]:
+    """
+    最近lookback个非空值的首尾差 / lookback，非空值不足时返回None
+
+    尾部lookback个值都非空时直接取首尾两个元素，不扫描、不复制整列。
+    """
+    tail = values[-lookback:]
+    if len(tail) == lookback and not np.isnan(tail).any():
+        return (tail[-1] - tail[0]) / lookback
+    finite = values[~np.isnan(values)]
+    if len(finite) < lookback:
+        return None
+    return (finite[-1] - finite[-lookback]) / lookback
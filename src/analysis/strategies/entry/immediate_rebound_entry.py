@@ -172,7 +172,7 @@ class ImmediateReboundEntry(BaseEntryStrategy):
         metadata = self._metadata_at(cache, row_pos)
         score = self._score(metadata)
         metadata["score"] = score
-        confidence = float(np.clip(self.buy_confidence + (score - 60.0) / 600.0, 0.0, 0.98))
+        confidence = float(min(max(self.buy_confidence + (score - 60.0) / 600.0, 0.0), 0.98))
         return TradingSignal(
             action=SignalAction.BUY,
             confidence=confidence,
@@ -224,18 +224,15 @@ class ImmediateReboundEntry(BaseEntryStrategy):
         close_return = _safe_float(metadata.get("close_return_1d_pct")) or 0.0
         support_bonus = max(0.0, 3.0 - abs(low_vs_ema20)) * 4.0
         rsi_bonus = max(0.0, 58.0 - abs(rsi - 48.0)) / 3.0
-        return float(
-            np.clip(
-                35.0
-                + support_bonus
-                + rsi_bonus
-                + close_location * 18.0
-                + min(volume_ratio, 2.0) * 4.0
-                - max(close_return, 0.0) * 2.0,
-                0.0,
-                100.0,
-            )
+        score = (
+            35.0
+            + support_bonus
+            + rsi_bonus
+            + close_location * 18.0
+            + min(volume_ratio, 2.0) * 4.0
+            - max(close_return, 0.0) * 2.0
         )
+        return float(min(max(score, 0.0), 100.0))
 
 
 class ImmediateReboundOversoldUptrendEntry(ImmediateReboundEntry):
@@ -6,6 +6,7 @@ MACD金叉Entry策略
 
 from ..base_entry_strategy import BaseEntryStrategy
 from ...signals import TradingSignal, SignalAction, MarketData
+from .crossover_utils import golden_cross_last, golden_cross_mask
 import numpy as np
 import pandas as pd
 
@@ -37,6 +38,64 @@ class MACDCrossoverStrategy(BaseEntryStrategy):
         self.confirm_volume = confirm_with_volume
         self.confirm_trend = confirm_with_trend
         self.min_confidence = min_confidence
+
+    def precompute_entry_signals(
+        self,
+        *,
+        ticker: str,
+        features: pd.DataFrame,
+        **_unused: object,
+    ) -> dict[int, TradingSignal]:
+        """
+        整段特征一次性算出金叉与确认项的置信度，只对达到阈值的行生成信号
+
+        成交量均线缺失时的 rolling(20) 回退也整列只算一次，
+        避免逐bar调用时每次对全历史重算。
+        """
+        if len(features) < 2 or 'MACD_Hist' not in features.columns:
+            return {}
+
+        candidates = golden_cross_mask(features['MACD_Hist'].to_numpy(dtype=float))
+
+        needed = (['Volume'] if self.confirm_volume else []) + (
+            ['Close', 'EMA_200'] if self.confirm_trend else []
+        )
+        if all(column in features.columns for column in needed):
+            # 与 generate_entry_signal 相同的加减顺序，保证阈值比较逐位一致
+            confidence = np.full(len(features), 0.7)
+            if self.confirm_volume:
+                volume = features['Volume']
+                volume_avg = volume.rolling(20).mean()
+                if 'Volume_SMA_20' in features.columns:
+                    volume_sma = features['Volume_SMA_20']
+                    volume_avg = volume_sma.where(volume_sma.notna(), volume_avg)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    volume_ratio = (volume / volume_avg).to_numpy(dtype='float64', na_value=np.nan)
+                avg_ok = (volume_avg.notna() & (volume_avg > 0)).to_numpy(dtype=bool)
+                confidence += np.where(avg_ok, np.where(volume_ratio > 1.2, 0.1, -0.05), 0.0)
+            if self.confirm_trend:
+                above_ema = (features['Close'] > features['EMA_200']).to_numpy(dtype=bool)
+                confidence += np.where(above_ema, 0.1, -0.15)
+            confidence = np.clip(confidence, 0.0, 1.0)
+            candidates = candidates & (confidence >= self.min_confidence)
+
+        signals: dict[int, TradingSignal] = {}
+        empty = pd.DataFrame()
+        for row_pos in np.flatnonzero(candidates):
+            row_pos_int = int(row_pos)
+            signal = self.generate_entry_signal(
+                MarketData(
+                    ticker=ticker,
+                    current_date=pd.Timestamp(features.index[row_pos_int]),
+                    df_features=features.iloc[: row_pos_int + 1],
+                    df_trades=empty,
+                    df_financials=empty,
+                    metadata={},
+                )
+            )
+            if signal.action == SignalAction.BUY:
+                signals[row_pos_int] = signal
+        return signals
     
     def generate_entry_signal(self, market_data: MarketData) -> TradingSignal:
         """生成入场信号"""
@@ -51,10 +110,11 @@ class MACDCrossoverStrategy(BaseEntryStrategy):
                 strategy_name=self.strategy_name
             )
         
-        # 检测MACD金叉
-        macd_hist_prev = df.iloc[-2]['MACD_Hist']
-        macd_hist_now = df.iloc[-1]['MACD_Hist']
-        golden_cross = macd_hist_prev < 0 and macd_hist_now > 0
+        # 检测MACD金叉（只读MACD_Hist列的两个值；多数bar到此即返回，不必构造整行）
+        macd_hist = df['MACD_Hist'].to_numpy()
+        macd_hist_prev = macd_hist[-2]
+        macd_hist_now = macd_hist[-1]
+        golden_cross = golden_cross_last(macd_hist)
         
         if not golden_cross:
             return TradingSignal(
@@ -71,11 +131,13 @@ class MACDCrossoverStrategy(BaseEntryStrategy):
         # 基础信号
         reasons = ["MACD golden cross detected"]
         confidence = 0.7
+        # 金叉后只构造一次最新行，后续按列名取值（原先每个字段各调一次 df.iloc[-1]）
+        latest = df.iloc[-1]
         
         # 可选确认1: 成交量
         if self.confirm_volume:
-            volume_now = df.iloc[-1]['Volume']
-            volume_avg = df.iloc[-1].get('Volume_SMA_20')
+            volume_now = latest['Volume']
+            volume_avg = latest.get('Volume_SMA_20')
             if pd.isna(volume_avg):
                 volume_avg = df['Volume'].rolling(20).mean().iloc[-1]
             
@@ -90,8 +152,8 @@ class MACDCrossoverStrategy(BaseEntryStrategy):
         
         # 可选确认2: 趋势
         if self.confirm_trend:
-            price = df.iloc[-1]['Close']
-            ema_200 = df.iloc[-1]['EMA_200']
+            price = latest['Close']
+            ema_200 = latest['EMA_200']
             
             if price > ema_200:
                 reasons.append(f"Above EMA200 (uptrend)")
@@ -100,7 +162,7 @@ class MACDCrossoverStrategy(BaseEntryStrategy):
                 reasons.append(f"Below EMA200 (caution)")
                 confidence -= 0.15
         
-        confidence = np.clip(confidence, 0.0, 1.0)
+        confidence = min(max(confidence, 0.0), 1.0)
         
         # 判断是否买入
         if confidence >= self.min_confidence:
@@ -111,8 +173,8 @@ class MACDCrossoverStrategy(BaseEntryStrategy):
                 metadata={
                     "macd_hist": macd_hist_now,
                     "macd_hist_prev": macd_hist_prev,
-                    "macd": df.iloc[-1]['MACD'],
-                    "macd_signal": df.iloc[-1]['MACD_Signal']
+                    "macd": latest['MACD'],
+                    "macd_signal": latest['MACD_Signal']
                 },
                 strategy_name=self.strategy_name
             )
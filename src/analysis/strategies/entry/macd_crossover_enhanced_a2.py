@@ -11,6 +11,7 @@ import pandas as pd
 
 from ...signals import MarketData, SignalAction, TradingSignal
 from ..base_entry_strategy import BaseEntryStrategy
+from .crossover_utils import golden_cross_last, golden_cross_mask
 
 
 class MACDCrossoverEnhancedA2(BaseEntryStrategy):
@@ -47,6 +48,41 @@ class MACDCrossoverEnhancedA2(BaseEntryStrategy):
         self.volume_surge_ratio = volume_surge_ratio
         self.min_confidence = min_confidence
 
+    def precompute_entry_signals(
+        self,
+        *,
+        ticker: str,
+        features: pd.DataFrame,
+        **_unused: object,
+    ) -> dict[int, TradingSignal]:
+        """
+        整段MACD_Hist一次性算出金叉掩码，只对金叉行调用 generate_entry_signal
+
+        非金叉行在逐bar路径中必然返回HOLD，因此结果与逐bar调用一致。
+        """
+        if len(features) < 2 or "MACD_Hist" not in features.columns:
+            return {}
+
+        candidates = golden_cross_mask(features["MACD_Hist"].to_numpy(dtype=float))
+
+        signals: dict[int, TradingSignal] = {}
+        empty = pd.DataFrame()
+        for row_pos in np.flatnonzero(candidates):
+            row_pos_int = int(row_pos)
+            signal = self.generate_entry_signal(
+                MarketData(
+                    ticker=ticker,
+                    current_date=pd.Timestamp(features.index[row_pos_int]),
+                    df_features=features.iloc[: row_pos_int + 1],
+                    df_trades=empty,
+                    df_financials=empty,
+                    metadata={},
+                )
+            )
+            if signal.action == SignalAction.BUY:
+                signals[row_pos_int] = signal
+        return signals
+
     def generate_entry_signal(self, market_data: MarketData) -> TradingSignal:
         """生成入场信号 - 方案A_V2版本（改进的价量维度优化）"""
 
@@ -60,10 +96,11 @@ class MACDCrossoverEnhancedA2(BaseEntryStrategy):
                 strategy_name=self.strategy_name,
             )
 
-        # Step 1: 检测MACD金叉
-        macd_hist_prev = df.iloc[-2]["MACD_Hist"]
-        macd_hist_now = df.iloc[-1]["MACD_Hist"]
-        golden_cross = macd_hist_prev < 0 and macd_hist_now > 0
+        # Step 1: 检测MACD金叉（只取一列ndarray，未金叉时无需整行读取）
+        macd_hist = df["MACD_Hist"].to_numpy()
+        macd_hist_prev = macd_hist[-2]
+        macd_hist_now = macd_hist[-1]
+        golden_cross = golden_cross_last(macd_hist)
 
         if not golden_cross:
             return TradingSignal(
@@ -77,15 +114,19 @@ class MACDCrossoverEnhancedA2(BaseEntryStrategy):
         # 基础信号
         reasons = ["MACD golden cross detected"]
         confidence = 0.7
+        latest = df.iloc[-1]
 
         # Step 2: 改进版 - 成交量确认（1.2x，相对平衡）
         if self.confirm_volume:
-            volume_now = df.iloc[-1]["Volume"]
+            volume_now = latest["Volume"]
 
-            # 计算5日平均成交量
-            volume_5d_avg = df["Volume"].iloc[-5:].mean()
+            # 计算5日平均成交量（与pandas mean一致：跳过NaN，全NaN时为NaN）
+            volume_5d = df["Volume"].to_numpy(dtype=float)[-5:]
+            volume_5d = volume_5d[~np.isnan(volume_5d)]
+            volume_5d_avg = volume_5d.mean() if volume_5d.size else np.nan
 
-            if pd.notna(volume_5d_avg) and volume_5d_avg > 0:
+            # 5日全缺失时均值为NaN，NaN > 0 为False，无需再单独判空
+            if volume_5d_avg > 0:
                 volume_ratio = volume_now / volume_5d_avg
                 if volume_ratio > self.volume_surge_ratio:
                     reasons.append(
@@ -100,8 +141,8 @@ class MACDCrossoverEnhancedA2(BaseEntryStrategy):
 
         # Step 3: 可选确认 - 趋势（EMA200）
         if self.confirm_trend:
-            price = df.iloc[-1]["Close"]
-            ema_200 = df.iloc[-1]["EMA_200"]
+            price = latest["Close"]
+            ema_200 = latest["EMA_200"]
 
             if price > ema_200:
                 reasons.append("Above EMA200 (uptrend ✓)")
@@ -110,7 +151,7 @@ class MACDCrossoverEnhancedA2(BaseEntryStrategy):
                 reasons.append("Below EMA200 (caution ⚠)")
                 confidence -= 0.15
 
-        confidence = np.clip(confidence, 0.0, 1.0)
+        confidence = min(max(confidence, 0.0), 1.0)
 
         # Step 4: 判断是否买入
         if confidence >= self.min_confidence:
@@ -121,8 +162,8 @@ class MACDCrossoverEnhancedA2(BaseEntryStrategy):
                 metadata={
                     "macd_hist": macd_hist_now,
                     "macd_hist_prev": macd_hist_prev,
-                    "macd": df.iloc[-1]["MACD"],
-                    "macd_signal": df.iloc[-1]["MACD_Signal"],
+                    "macd": latest["MACD"],
+                    "macd_signal": latest["MACD_Signal"],
                     "volume_ratio": volume_ratio if self.confirm_volume else None,
                 },
                 strategy_name=self.strategy_name,
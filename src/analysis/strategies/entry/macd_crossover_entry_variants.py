@@ -159,7 +159,7 @@ class _BaseMACDCrossoverFilteredStrategy(BaseEntryStrategy):
                     reasons.append("Below EMA200 (caution)")
                     confidence -= 0.15
 
-        confidence = float(np.clip(confidence, 0.0, 1.0))
+        confidence = float(min(max(confidence, 0.0), 1.0))
         metadata["golden_cross"] = True
 
         if confidence >= self.min_confidence:
@@ -9,6 +9,7 @@ import pandas as pd
 
 from ...signals import MarketData, SignalAction, TradingSignal
 from ..base_entry_strategy import BaseEntryStrategy
+from .crossover_utils import tail_rise
 
 
 def _float_token(value: float) -> str:
@@ -114,7 +115,7 @@ class MACDCrossoverWithPreCrossEntry(BaseEntryStrategy):
                 else:
                     reasons.append("EMA200 unavailable")
 
-            confidence = float(np.clip(confidence, 0.0, 1.0))
+            confidence = float(min(max(confidence, 0.0), 1.0))
 
             if confidence >= self.min_confidence:
                 return TradingSignal(
@@ -143,10 +144,8 @@ class MACDCrossoverWithPreCrossEntry(BaseEntryStrategy):
 
         hist_norm = _normalize_hist(df["MACD_Hist"], df["Close"])
         current = float(hist_norm.iloc[-1])
-        recent = hist_norm.tail(self.pre_rise_days)
         in_band = (-self.eps <= current) and (current <= self.eps)
-        rising = bool((recent.diff().dropna() > 0).all()) if len(recent) >= 2 else False
-        slope = float(recent.iloc[-1] - recent.iloc[0]) if len(recent) >= 2 else 0.0
+        rising, slope = tail_rise(hist_norm.to_numpy(dtype=float), self.pre_rise_days)
         slope_ok = slope >= self.pre_slope_min
 
         trend_ok = True
@@ -21,6 +21,9 @@
 - 板块联动强，RS用于过滤弱势板块中的"假突破"
 """
 
+import math
+from typing import Optional
+
 import numpy as np
 import pandas as pd
 
@@ -28,6 +31,36 @@ from src.data.benchmark_manager import BenchmarkManager
 
 from ...signals import MarketData, SignalAction, TradingSignal
 from ..base_entry_strategy import BaseEntryStrategy
+from .crossover_utils import golden_cross_last, golden_cross_mask
+
+
+_TOPIX_MANAGER: Optional[BenchmarkManager] = None
+_TOPIX_ARRAYS: Optional[tuple[pd.DataFrame, np.ndarray, np.ndarray]] = None
+
+
+def _topix_arrays() -> Optional[tuple[np.ndarray, np.ndarray]]:
+    """
+    返回按日期排序的 TOPIX (Date, Close) 数组，数据不可用时返回 None
+
+    BenchmarkManager 只创建一次；TOPIX 表本身由 BenchmarkManager 按文件
+    mtime 缓存，这里只在它换了对象（文件更新）时重新排序、转数组。
+    """
+    global _TOPIX_MANAGER, _TOPIX_ARRAYS
+
+    if _TOPIX_MANAGER is None:
+        _TOPIX_MANAGER = BenchmarkManager(client=None, data_root="data")
+    topix_df = _TOPIX_MANAGER.get_topix_data()
+    if topix_df is None or topix_df.empty:
+        return None
+
+    if _TOPIX_ARRAYS is None or _TOPIX_ARRAYS[0] is not topix_df:
+        dates = pd.to_datetime(topix_df["Date"]).to_numpy(dtype="datetime64[ns]")
+        closes = topix_df["Close"].to_numpy()
+        valid = ~np.isnat(dates)
+        dates, closes = dates[valid], closes[valid]
+        order = np.argsort(dates, kind="stable")
+        _TOPIX_ARRAYS = (topix_df, dates[order], closes[order])
+    return _TOPIX_ARRAYS[1], _TOPIX_ARRAYS[2]
 
 
 class MACDEnhancedFundamentalStrategy(BaseEntryStrategy):
@@ -76,6 +109,42 @@ class MACDEnhancedFundamentalStrategy(BaseEntryStrategy):
         self.bias_oversold_threshold = bias_oversold_threshold
         self.bias_recovery_threshold = bias_recovery_threshold
 
+    def precompute_entry_signals(
+        self,
+        *,
+        ticker: str,
+        features: pd.DataFrame,
+        **_unused: object,
+    ) -> dict[int, TradingSignal]:
+        """
+        整段MACD_Hist一次性算出金叉掩码，只对金叉且数据足够的行调用
+        generate_entry_signal（RS/Bias评分仍逐行计算，结果与逐bar调用一致）
+        """
+        if "MACD_Hist" not in features.columns:
+            return {}
+
+        candidates = golden_cross_mask(features["MACD_Hist"].to_numpy(dtype=float))
+        # 与 generate_entry_signal 的最小数据长度检查一致
+        candidates[: max(self.bias_lookback + 1, 50) - 1] = False
+
+        signals: dict[int, TradingSignal] = {}
+        empty = pd.DataFrame()
+        for row_pos in np.flatnonzero(candidates):
+            row_pos_int = int(row_pos)
+            signal = self.generate_entry_signal(
+                MarketData(
+                    ticker=ticker,
+                    current_date=pd.Timestamp(features.index[row_pos_int]),
+                    df_features=features.iloc[: row_pos_int + 1],
+                    df_trades=empty,
+                    df_financials=empty,
+                    metadata={},
+                )
+            )
+            if signal.action == SignalAction.BUY:
+                signals[row_pos_int] = signal
+        return signals
+
     def generate_entry_signal(self, market_data: MarketData) -> TradingSignal:
         """
         生成入场信号（基于连续评分制）
@@ -126,7 +195,7 @@ class MACDEnhancedFundamentalStrategy(BaseEntryStrategy):
             + rs_score * self.rs_weight
             + bias_score * self.bias_weight
         )
-        confidence = np.clip(confidence, 0.0, 1.0)
+        confidence = min(max(confidence, 0.0), 1.0)
 
         breakdown = {
             "rs_score": round(rs_score, 3),
@@ -173,16 +242,13 @@ class MACDEnhancedFundamentalStrategy(BaseEntryStrategy):
         """
         检测MACD金叉：MACD_Hist 由负转正
         """
-        if len(df) < 2:
+        if "MACD_Hist" not in df.columns:
             return False
 
-        macd_hist_prev = df.iloc[-2].get("MACD_Hist", np.nan)
-        macd_hist_now = df.iloc[-1].get("MACD_Hist", np.nan)
-
-        if pd.isna(macd_hist_prev) or pd.isna(macd_hist_now):
-            return False
-
-        return macd_hist_prev < 0 and macd_hist_now > 0
+        # object列中的None与pd.isna一致按NaN处理（NaN比较恒为False）
+        return golden_cross_last(
+            df["MACD_Hist"].to_numpy(dtype="float64", na_value=np.nan)
+        )
 
     # ===== 维度1：相对强度（RS）连续评分 =====
     def _score_relative_strength_continuous(
@@ -207,20 +273,21 @@ class MACDEnhancedFundamentalStrategy(BaseEntryStrategy):
                 return 0.0
 
             # ===== 步骤1：计算个股20日收益率 =====
-            price_20d_ago = df.iloc[-20]["Close"]
-            price_now = df.iloc[-1]["Close"]
+            # 转float读取：None与pd.isna一致视为缺失，走下面的 0.0 分支
+            close = df["Close"].to_numpy(dtype="float64", na_value=np.nan)
+            price_20d_ago = close[-20]
+            price_now = close[-1]
 
-            if pd.isna(price_20d_ago) or price_20d_ago <= 0 or pd.isna(price_now):
+            if math.isnan(price_20d_ago) or price_20d_ago <= 0 or math.isnan(price_now):
                 return 0.0
 
             stock_return_20d = (price_now - price_20d_ago) / price_20d_ago
 
             # ===== 步骤2：获取TOPIX 20日收益率 =====
             try:
-                # 获取当前日期对应的数据行
-                current_row = df.iloc[-1]
-                if "Date" in current_row.index:
-                    entry_date = pd.to_datetime(current_row["Date"])
+                # 获取当前行对应的日期
+                if "Date" in df.columns:
+                    entry_date = pd.to_datetime(df["Date"].iat[-1])
                 elif hasattr(df, "index") and df.index.name == "Date":
                     entry_date = pd.to_datetime(df.index[-1])
                 else:
@@ -233,34 +300,32 @@ class MACDEnhancedFundamentalStrategy(BaseEntryStrategy):
                 # 计算20天前的日期（交易日约为日历日的70%，留些buffer）
                 lookback_date = entry_date - pd.Timedelta(days=28)
 
-                # 从 BenchmarkManager 获取 TOPIX 数据
-                manager = BenchmarkManager(client=None, data_root="data")
-                topix_df = manager.get_topix_data()
+                # 从 BenchmarkManager 获取 TOPIX 数据（按日期排序的数组）
+                topix = _topix_arrays()
 
-                if topix_df is None or topix_df.empty:
+                if topix is None:
                     # TOPIX 数据不可用，保守返回0.5（中性）
                     return 0.5
 
-                # 过滤 TOPIX 数据到指定日期范围
-                topix_df["Date"] = pd.to_datetime(topix_df["Date"])
-                topix_recent = (
-                    topix_df[
-                        (topix_df["Date"] >= lookback_date)
-                        & (topix_df["Date"] <= entry_date)
-                    ]
-                    .copy()
-                    .sort_values("Date")
+                # 二分定位 [lookback_date, entry_date] 区间的首尾行
+                topix_dates, topix_closes = topix
+                start_pos = np.searchsorted(
+                    topix_dates, np.datetime64(lookback_date), side="left"
+                )
+                end_pos = (
+                    np.searchsorted(topix_dates, np.datetime64(entry_date), side="right")
+                    - 1
                 )
 
-                if len(topix_recent) < 2:
+                if end_pos - start_pos + 1 < 2:
                     # 数据不足，保守返回0.5（中性）
                     return 0.5
 
                 # 获取TOPIX 20日首尾价格
-                topix_price_start = topix_recent.iloc[0]["Close"]
-                topix_price_end = topix_recent.iloc[-1]["Close"]
+                topix_price_start = topix_closes[start_pos]
+                topix_price_end = topix_closes[end_pos]
 
-                if pd.isna(topix_price_start) or topix_price_start <= 0:
+                if math.isnan(topix_price_start) or topix_price_start <= 0:
                     return 0.5
 
                 topix_return_20d = (
@@ -335,18 +400,19 @@ class MACDEnhancedFundamentalStrategy(BaseEntryStrategy):
             # 计算乖离率（Bias）：(Close - MA25) / MA25
             ma25_col = "SMA_25" if "SMA_25" in df.columns else None
             if ma25_col is None:
-                # 如果没有预计算的SMA_25，则计算
-                df_temp = df.copy()
-                df_temp["SMA_25"] = df_temp["Close"].rolling(25).mean()
-                ma25 = df_temp["SMA_25"]
+                # 如果没有预计算的SMA_25，则整列rolling计算（与特征里的SMA_25
+                # 逐位一致；只截尾部重算会因累加起点不同产生末位差异）
+                ma25 = df["Close"].rolling(25).mean().to_numpy()
             else:
-                ma25 = df[ma25_col]
+                ma25 = df[ma25_col].to_numpy()
 
-            close = df["Close"]
-            bias = (close - ma25) / ma25 * 100  # 百分比
+            # 乖离率逐元素计算，只需最近 bias_lookback 天
+            close = df["Close"].to_numpy()[-self.bias_lookback :]
+            ma25 = ma25[-self.bias_lookback :]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                recent_bias = (close - ma25) / ma25 * 100  # 百分比
 
             # 检查过去 bias_lookback 天内是否触及超卖阈值
-            recent_bias = bias.iloc[-self.bias_lookback :]
             touched_oversold = (recent_bias < self.bias_oversold_threshold).any()
 
             # 如果最近没有触及超卖，则返回0（不满足超卖反弹的条件）
@@ -354,7 +420,7 @@ class MACDEnhancedFundamentalStrategy(BaseEntryStrategy):
                 return 0.0
 
             # 获取当前乖离率
-            current_bias = bias.iloc[-1]
+            current_bias = recent_bias[-1]
 
             # ===== 应用归一化范围 =====
             # 从超卖阈值（-10%）到恢复阈值（-5%）的进度
@@ -367,7 +433,7 @@ class MACDEnhancedFundamentalStrategy(BaseEntryStrategy):
                 progress = (current_bias - self.bias_oversold_threshold) / (
                     self.bias_recovery_threshold - self.bias_oversold_threshold
                 )
-                return np.clip(progress, 0.0, 1.0)
+                return min(max(progress, 0.0), 1.0)
 
         except Exception:
             return 0.0
@@ -8,6 +8,7 @@ import pandas as pd
 
 from ...signals import MarketData, SignalAction, TradingSignal
 from ..base_entry_strategy import BaseEntryStrategy
+from .crossover_utils import tail_rise
 
 
 def _float_token(value: float) -> str:
@@ -179,10 +180,8 @@ class MACDHistHysteresisPreCrossEntry(MACDHistHysteresisEntry):
                 strategy_name=self.strategy_name,
             )
 
-        recent = hist_norm.tail(self.pre_rise_days)
         in_band = (-self.eps <= current) and (current <= self.eps)
-        rising = bool((recent.diff().dropna() > 0).all()) if len(recent) >= 2 else False
-        slope = float(recent.iloc[-1] - recent.iloc[0]) if len(recent) >= 2 else 0.0
+        rising, slope = tail_rise(hist_norm.to_numpy(dtype=float), self.pre_rise_days)
         pre_cross = in_band and rising and slope >= self.pre_slope_min
 
         metadata["pre_cross_slope"] = slope
@@ -807,7 +807,7 @@ class MACDPreCrossMomentumEntry(BaseEntryStrategy):
             confidence += 0.04
             reasons.append("Price is above EMA200")
 
-        confidence = float(np.clip(confidence, 0.0, 1.0))
+        confidence = float(min(max(confidence, 0.0), 1.0))
         if confidence < self.min_confidence:
             return TradingSignal(
                 action=SignalAction.HOLD,
@@ -4,7 +4,6 @@ from __future__ import annotations
 
 from typing import Dict
 
-import numpy as np
 import pandas as pd
 
 from ...signals import MarketData, SignalAction, TradingSignal
@@ -141,7 +140,7 @@ class MovingAverageCrossoverEntry(BaseEntryStrategy):
                     )
                     confidence -= 0.08
 
-        confidence = float(np.clip(confidence, 0.0, 1.0))
+        confidence = float(min(max(confidence, 0.0), 1.0))
 
         if confidence >= self.min_confidence:
             return TradingSignal(
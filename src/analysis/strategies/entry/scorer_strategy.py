@@ -4,6 +4,7 @@
 使用Score Utils计算综合分数，达到阈值时买入
 """
 
+from bisect import bisect_left
 from typing import Any
 
 import numpy as np
@@ -11,7 +12,23 @@ import pandas as pd
 
 from ..base_entry_strategy import BaseEntryStrategy
 from ...signals import TradingSignal, SignalAction, MarketData
-from ...scoring_utils import calculate_composite_score, check_earnings_risk
+from ...scoring_utils import (
+    EARNINGS_DATES_KEY,
+    TECHNICAL_SCORE_COLUMNS,
+    calculate_composite_score,
+    calculate_fundamental_score_series,
+    calculate_institutional_score_series,
+    calculate_technical_score_series,
+    calculate_volatility_score_series,
+    check_earnings_risk,
+    make_score_combiner,
+    prepare_earnings_dates,
+)
+
+
+# Enhanced渐进式财报惩罚：距财报天数 <=1 / <=3 / <=7 / 更远 对应的分数系数
+_EARNINGS_PENALTY_DAYS = (1, 3, 7)
+_EARNINGS_PENALTY_FACTORS = (0.5, 0.7, 0.85, 1.0)
 
 
 class SimpleScorerStrategy(BaseEntryStrategy):
@@ -34,6 +51,7 @@ class SimpleScorerStrategy(BaseEntryStrategy):
             "fundamental": 0.2,
             "volatility": 0.1
         }
+        self._combine_scores = make_score_combiner(self.weights)
 
     precompute_family_key = "composite_scorer_v1"
 
@@ -88,8 +106,8 @@ class SimpleScorerStrategy(BaseEntryStrategy):
             market_data.df_trades,
             market_data.df_financials,
             market_data.metadata,
-            weights=self.weights,
-            current_date=market_data.current_date
+            current_date=market_data.current_date,
+            combine=self._combine_scores
         )
         
         # 检查财报风险
@@ -155,6 +173,7 @@ class EnhancedScorerStrategy(BaseEntryStrategy):
             "fundamental": 0.20,
             "volatility": 0.10
         }
+        self._combine_scores = make_score_combiner(self.weights)
 
     precompute_family_key = "composite_scorer_v1"
 
@@ -209,8 +228,8 @@ class EnhancedScorerStrategy(BaseEntryStrategy):
             market_data.df_trades,
             market_data.df_financials,
             market_data.metadata,
-            weights=self.weights,
-            current_date=market_data.current_date
+            current_date=market_data.current_date,
+            combine=self._combine_scores
         )
         
         # 检查财报风险（增强版：渐进式惩罚）
@@ -221,12 +240,7 @@ class EnhancedScorerStrategy(BaseEntryStrategy):
         
         if has_earnings_risk:
             original_score = score
-            if days_until <= 1:
-                score *= 0.5  # 50% penalty
-            elif days_until <= 3:
-                score *= 0.7  # 30% penalty
-            elif days_until <= 7:
-                score *= 0.85  # 15% penalty
+            score *= _EARNINGS_PENALTY_FACTORS[bisect_left(_EARNINGS_PENALTY_DAYS, days_until)]
         
         # 判断是否买入
         if score >= self.threshold:
@@ -260,17 +274,6 @@ class EnhancedScorerStrategy(BaseEntryStrategy):
         )
 
 
-_TECHNICAL_REQUIRED_COLUMNS = (
-    "Close",
-    "EMA_20",
-    "EMA_50",
-    "EMA_200",
-    "RSI",
-    "MACD_Hist",
-    "MACD",
-)
-
-
 def _build_scorer_precompute_cache(
     *,
     features: pd.DataFrame,
@@ -282,7 +285,7 @@ def _build_scorer_precompute_cache(
         cache = pd.DataFrame(index=features.index)
         cache.attrs["valid"] = False
         return cache
-    if not all(column in features.columns for column in _TECHNICAL_REQUIRED_COLUMNS):
+    if not all(column in features.columns for column in TECHNICAL_SCORE_COLUMNS):
         cache = pd.DataFrame(index=features.index)
         cache.attrs["valid"] = False
         return cache
@@ -303,24 +306,26 @@ def _build_scorer_precompute_cache(
         cache.attrs["valid"] = False
         return cache
 
+    # 各分项分数均为0-100的整数档位，float32可无损保存；缓存按(family, ticker)
+    # 常驻内存，合成总分时再升回float64，与逐日打分结果一致
     cache = pd.DataFrame(
         {
-            "technical": _technical_scores(features),
-            "institutional": _institutional_scores(
+            "technical": calculate_technical_score_series(features),
+            "institutional": calculate_institutional_score_series(
                 features.index,
                 trades_frame,
             ),
-            "fundamental": _fundamental_scores(
+            "fundamental": calculate_fundamental_score_series(
                 features.index,
                 financials_frame,
             ),
-            "volatility": _volatility_scores(features),
+            "volatility": calculate_volatility_score_series(features),
         },
         index=features.index,
-    )
+    ).astype("float32")
     earnings_risk, days_until = _earnings_risk_series(features.index, metadata or {})
     cache["earnings_risk"] = earnings_risk
-    cache["days_until_earnings"] = days_until
+    cache["days_until_earnings"] = days_until.astype("int16")
     cache.attrs["valid"] = True
     return cache
 
@@ -336,42 +341,43 @@ def _precompute_scorer_signals(
     if scores.empty or not bool(scores.attrs.get("valid", False)):
         return {}
 
-    total_score = (
-        scores["technical"] * weights["technical"]
-        + scores["institutional"] * weights["institutional"]
-        + scores["fundamental"] * weights["fundamental"]
-        + scores["volatility"] * weights["volatility"]
+    # 列式取出一次（升回float64），逐行只做数组索引
+    component_values = {
+        name: scores[name].to_numpy(dtype="float64")
+        for name in ("technical", "institutional", "fundamental", "volatility")
+    }
+    total_score = pd.Series(
+        component_values["technical"] * weights["technical"]
+        + component_values["institutional"] * weights["institutional"]
+        + component_values["fundamental"] * weights["fundamental"]
+        + component_values["volatility"] * weights["volatility"],
+        index=scores.index,
     )
     earnings_risk = scores["earnings_risk"].astype(bool)
     days_until = pd.to_numeric(scores["days_until_earnings"], errors="coerce").fillna(999)
 
     adjusted_score = total_score.copy()
     if enhanced:
-        adjusted_score = adjusted_score.where(~(earnings_risk & (days_until <= 1)), adjusted_score * 0.5)
-        adjusted_score = adjusted_score.where(
-            ~(earnings_risk & (days_until > 1) & (days_until <= 3)),
-            adjusted_score * 0.7,
-        )
-        adjusted_score = adjusted_score.where(
-            ~(earnings_risk & (days_until > 3) & (days_until <= 7)),
-            adjusted_score * 0.85,
-        )
+        tiers = np.searchsorted(_EARNINGS_PENALTY_DAYS, days_until.to_numpy(), side="left")
+        factors = np.asarray(_EARNINGS_PENALTY_FACTORS)[tiers]
+        adjusted_score = adjusted_score.where(~earnings_risk, adjusted_score * factors)
     else:
         adjusted_score = adjusted_score.where(~earnings_risk, adjusted_score * 0.8)
 
     buy_mask = (adjusted_score >= threshold).fillna(False)
+    adjusted_values = adjusted_score.to_numpy(dtype="float64")
+    risk_values = earnings_risk.to_numpy(dtype=bool)
+    days_values = days_until.to_numpy()
     signals: dict[int, TradingSignal] = {}
     for row_pos in np.flatnonzero(buy_mask.to_numpy(dtype=bool)):
         row_pos_int = int(row_pos)
-        score = float(adjusted_score.iloc[row_pos_int])
+        score = float(adjusted_values[row_pos_int])
         breakdown = {
-            "technical": float(scores["technical"].iloc[row_pos_int]),
-            "institutional": float(scores["institutional"].iloc[row_pos_int]),
-            "fundamental": float(scores["fundamental"].iloc[row_pos_int]),
-            "volatility": float(scores["volatility"].iloc[row_pos_int]),
+            name: float(values[row_pos_int])
+            for name, values in component_values.items()
         }
-        has_risk = bool(earnings_risk.iloc[row_pos_int])
-        days = int(days_until.iloc[row_pos_int])
+        has_risk = bool(risk_values[row_pos_int])
+        days = int(days_values[row_pos_int])
 
         if enhanced:
             reasons = [f"Enhanced score {score:.1f} >= {threshold}"]
@@ -411,143 +417,6 @@ def _precompute_scorer_signals(
     return signals
 
 
-def _technical_scores(features: pd.DataFrame) -> pd.Series:
-    close = pd.to_numeric(features["Close"], errors="coerce")
-    ema20 = pd.to_numeric(features["EMA_20"], errors="coerce")
-    ema50 = pd.to_numeric(features["EMA_50"], errors="coerce")
-    ema200 = pd.to_numeric(features["EMA_200"], errors="coerce")
-    rsi = pd.to_numeric(features["RSI"], errors="coerce")
-    macd_hist = pd.to_numeric(features["MACD_Hist"], errors="coerce")
-    macd = pd.to_numeric(features["MACD"], errors="coerce")
-
-    score = pd.Series(50.0, index=features.index, dtype="float64")
-    perfect_order = (close > ema20) & (ema20 > ema50) & (ema50 > ema200)
-    score += perfect_order.fillna(False).astype(float) * 20.0
-    basic_uptrend = (~perfect_order.fillna(False)) & (close > ema200)
-    score += basic_uptrend.fillna(False).astype(float) * 10.0
-    downtrend = close < ema200
-    score -= downtrend.fillna(False).astype(float) * 20.0
-
-    healthy_rsi = (rsi >= 40) & (rsi <= 65)
-    score += healthy_rsi.fillna(False).astype(float) * 10.0
-    score -= (rsi > 75).fillna(False).astype(float) * 10.0
-    score += (rsi < 30).fillna(False).astype(float) * 5.0
-
-    positive_hist = macd_hist > 0
-    score += positive_hist.fillna(False).astype(float) * 10.0
-    score += (positive_hist.fillna(False) & (macd > 0).fillna(False)).astype(float) * 5.0
-    return score.clip(lower=0.0, upper=100.0)
-
-
-def _institutional_scores(index: pd.Index, trades: pd.DataFrame) -> pd.Series:
-    if trades.empty or "EnDate" not in trades.columns or "FrgnBal" not in trades.columns:
-        return pd.Series(50.0, index=index, dtype="float64")
-
-    local = trades.copy()
-    local["EnDate"] = pd.to_datetime(local["EnDate"], errors="coerce")
-    local["FrgnBal"] = pd.to_numeric(local["FrgnBal"], errors="coerce")
-    local = local[local["EnDate"].notna()].sort_values("EnDate")
-    if local.empty:
-        return pd.Series(50.0, index=index, dtype="float64")
-
-    trade_dates = pd.DatetimeIndex(local["EnDate"])
-    frgn = local["FrgnBal"].to_numpy(dtype="float64")
-    values: list[float] = []
-    for current_date in pd.DatetimeIndex(index):
-        start_date = current_date - pd.Timedelta(days=35)
-        left = int(trade_dates.searchsorted(start_date, side="left"))
-        right = int(trade_dates.searchsorted(current_date, side="right"))
-        if left >= right:
-            values.append(50.0)
-            continue
-        recent = frgn[left:right]
-        net_foreign_flow = float(np.nansum(recent))
-        score = 50.0
-        if net_foreign_flow > 0:
-            score += 20.0
-            mean_value = _nanmean_or_nan(recent)
-            latest_value = recent[-1]
-            if not np.isnan(latest_value) and not np.isnan(mean_value) and latest_value > mean_value:
-                score += 10.0
-        elif net_foreign_flow < 0:
-            score -= 15.0
-        values.append(float(np.clip(score, 0.0, 100.0)))
-    return pd.Series(values, index=index, dtype="float64")
-
-
-def _fundamental_scores(index: pd.Index, financials: pd.DataFrame) -> pd.Series:
-    if financials.empty or "DiscDate" not in financials.columns or len(financials) < 2:
-        return pd.Series(50.0, index=index, dtype="float64")
-
-    local = financials.copy()
-    local["DiscDate"] = pd.to_datetime(local["DiscDate"], errors="coerce")
-    local = local[local["DiscDate"].notna()].sort_values("DiscDate")
-    if len(local) < 2:
-        return pd.Series(50.0, index=index, dtype="float64")
-
-    disc_dates = pd.DatetimeIndex(local["DiscDate"])
-    values: list[float] = []
-    for current_date in pd.DatetimeIndex(index):
-        right = int(disc_dates.searchsorted(current_date, side="right"))
-        if right < 2:
-            values.append(50.0)
-            continue
-        latest = local.iloc[right - 1]
-        prev = local.iloc[right - 2]
-        score = 50.0
-
-        sales = pd.to_numeric(latest.get("Sales", 0), errors="coerce")
-        prev_sales = pd.to_numeric(prev.get("Sales", 0), errors="coerce")
-        if pd.notna(sales) and pd.notna(prev_sales) and prev_sales > 0:
-            sales_growth = (sales / prev_sales - 1) * 100
-            if sales_growth > 10:
-                score += 15
-            elif sales_growth > 5:
-                score += 10
-            elif sales_growth < -5:
-                score -= 15
-
-        op = pd.to_numeric(latest.get("OperatingProfit", 0), errors="coerce")
-        prev_op = pd.to_numeric(prev.get("OperatingProfit", 0), errors="coerce")
-        if pd.notna(op) and pd.notna(prev_op) and prev_op > 0:
-            op_growth = (op / prev_op - 1) * 100
-            if op_growth > 15:
-                score += 20
-            elif op_growth > 8:
-                score += 12
-            elif op_growth < -10:
-                score -= 20
-
-        forecast_sales = pd.to_numeric(latest.get("FSales", 0), errors="coerce")
-        if pd.notna(forecast_sales) and pd.notna(sales) and forecast_sales > 0:
-            if sales > forecast_sales * 1.03:
-                score += 15
-        values.append(float(np.clip(score, 0.0, 100.0)))
-    return pd.Series(values, index=index, dtype="float64")
-
-
-def _volatility_scores(features: pd.DataFrame) -> pd.Series:
-    score = pd.Series(50.0, index=features.index, dtype="float64")
-    row_numbers = pd.Series(np.arange(len(features)), index=features.index)
-    eligible = row_numbers >= 19
-
-    if "ATR_Z_60" in features.columns:
-        atr_zscore = pd.to_numeric(features["ATR_Z_60"], errors="coerce")
-    else:
-        atr_zscore = pd.Series(np.nan, index=features.index, dtype="float64")
-
-    if "ATR" in features.columns:
-        atr = pd.to_numeric(features["ATR"], errors="coerce")
-        atr_avg = atr.rolling(window=60, min_periods=1).mean()
-        atr_std = atr.rolling(window=60, min_periods=1).std()
-        fallback_zscore = (atr - atr_avg) / atr_std.where(atr_std > 0)
-        atr_zscore = atr_zscore.where(atr_zscore.notna(), fallback_zscore)
-
-    score += (eligible & (atr_zscore < -0.5)).fillna(False).astype(float) * 20.0
-    score -= (eligible & (atr_zscore > 1.0)).fillna(False).astype(float) * 20.0
-    return score.clip(lower=0.0, upper=100.0)
-
-
 def _earnings_risk_series(
     index: pd.Index,
     metadata: dict[str, Any],
@@ -559,34 +428,18 @@ def _earnings_risk_series(
             pd.Series(999, index=index, dtype="int64"),
         )
 
-    events: list[pd.Timestamp] = []
-    for event in raw_events:
-        try:
-            events.append(pd.to_datetime(event["Date"]))
-        except Exception:
-            continue
-
-    has_risk: list[bool] = []
-    days_until: list[int] = []
-    for current_date in pd.DatetimeIndex(index):
-        found = False
-        found_days = 999
-        for event_date in events:
-            delta = (event_date - current_date).days
-            if 0 <= delta <= 7:
-                found = True
-                found_days = int(delta)
-                break
-        has_risk.append(found)
-        days_until.append(found_days)
+    earnings_dates = metadata.get(EARNINGS_DATES_KEY)
+    if earnings_dates is None:
+        earnings_dates = prepare_earnings_dates(metadata)[EARNINGS_DATES_KEY]
+
+    # 与 check_earnings_risk 相同的判定，整段日期一次searchsorted
+    current_days = pd.DatetimeIndex(index).to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+    pos = np.searchsorted(earnings_dates, current_days, side="left")
+    has_next = pos < len(earnings_dates)
+    delta = np.full(len(current_days), 999, dtype="int64")
+    delta[has_next] = (earnings_dates[pos[has_next]] - current_days[has_next]).astype("int64")
+    has_risk = has_next & (delta <= 7)
     return (
         pd.Series(has_risk, index=index, dtype="bool"),
-        pd.Series(days_until, index=index, dtype="int64"),
+        pd.Series(np.where(has_risk, delta, 999), index=index, dtype="int64"),
     )
-
-
-def _nanmean_or_nan(values: np.ndarray) -> float:
-    finite_values = values[~np.isnan(values)]
-    if len(finite_values) == 0:
-        return float("nan")
-    return float(finite_values.mean())
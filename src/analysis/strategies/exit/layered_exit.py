@@ -4,19 +4,118 @@
 混合使用Score Utils和技术指标
 """
 
+from dataclasses import dataclass, field
 from ..base_exit_strategy import BaseExitStrategy
 from ...signals import TradingSignal, SignalAction, MarketData, Position
 from ...scoring_utils import (
+    TECHNICAL_SCORE_COLUMNS,
+    _DEFAULT_SCORE_COMBINER,
+    _float_values,
     calculate_composite_score,
+    calculate_fundamental_score_series,
+    calculate_institutional_score_series,
+    calculate_technical_score_series,
+    calculate_volatility_score_series,
     detect_institutional_exodus,
     check_earnings_risk,
     detect_trend_breakdown,
-    detect_market_deterioration
+    detect_trend_breakdown_series,
+    detect_market_deterioration,
+    market_deterioration_message
 )
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
 import pandas as pd
 
 
+@dataclass(slots=True)
+class LayeredExitContext:
+    """
+    单只股票的逐bar预计算结果（只依赖行情，不依赖持仓）
+
+    回测时每根bar的df_features都是同一张表的前缀，因此与持仓无关的层
+    （机构撤离、趋势破坏、多维弱化、综合分数）可以整段一次算好，
+    每日只做O(1)查表；依赖持仓的层（入场对比、追踪止损、持有天数）
+    仍按bar计算，但改用数组取值。
+
+    priority_layer[i]是第i根bar上Layer 1-4中第一个可能触发的层号（0表示均不会
+    触发，可直接跳到追踪止损和定期审查）；只有Layer 3依赖入场状态需要再判定。
+    """
+    dates: np.ndarray
+    close: np.ndarray
+    atr: np.ndarray
+    ema200: np.ndarray
+    macd_hist: np.ndarray
+    exodus: np.ndarray
+    trend_breakdown: np.ndarray
+    weakness: np.ndarray
+    composite: Optional[np.ndarray]
+    trade_dates: np.ndarray
+    foreign_cumsum: np.ndarray
+    priority_layer: np.ndarray
+    _peak_cache: Dict[int, np.ndarray] = field(default_factory=dict, repr=False)
+    _review_cache: Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray]] = field(
+        default_factory=dict, repr=False
+    )
+
+    def locate(self, market_data: MarketData) -> Optional[int]:
+        """返回market_data对应的行号；数据不是预计算表的前缀时返回None"""
+        df = market_data.df_features
+        row = len(df) - 1
+        if row < 0 or row >= len(self.dates):
+            return None
+        current = np.datetime64(pd.Timestamp(market_data.current_date), "ns")
+        if self.dates[row] != current:
+            return None
+        if np.datetime64(pd.Timestamp(df.index[-1]), "ns") != current:
+            return None
+        if np.datetime64(pd.Timestamp(df.index[0]), "ns") != self.dates[0]:
+            return None
+        return row
+
+    def peak_close(self, entry_date: pd.Timestamp, row: int) -> float:
+        """入场bar到第row行的最高收盘价（按入场bar缓存累计最大值，NaN跳过）"""
+        entry_day = np.datetime64(pd.Timestamp(entry_date), "ns")
+        entry_idx = int(np.searchsorted(self.dates, entry_day, side="left"))
+        if entry_idx > row:
+            return np.nan
+        peaks = self._peak_cache.get(entry_idx)
+        if peaks is None:
+            peaks = np.fmax.accumulate(self.close[entry_idx:])
+            self._peak_cache[entry_idx] = peaks
+        return float(peaks[row - entry_idx])
+    
+    def review_calendar(
+        self,
+        entry_date: pd.Timestamp,
+        review_days: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """按入场日缓存逐bar的 (持有天数, 是否审查日)，审查日为持有天数是review_days整数倍的bar"""
+        entry_day = np.datetime64(pd.Timestamp(entry_date), "ns")
+        key = (int(entry_day.astype(np.int64)), review_days)
+        calendar = self._review_cache.get(key)
+        if calendar is None:
+            days_held = (self.dates - entry_day) // np.timedelta64(1, "D")
+            is_review = (days_held > 0) & (days_held % review_days == 0)
+            calendar = (days_held, is_review)
+            self._review_cache[key] = calendar
+        return calendar
+    
+    def foreign_window(
+        self,
+        end: np.datetime64,
+        window_days: int
+    ) -> Tuple[int, float]:
+        """外资净额窗口 (end - window_days, end] 的 (记录数, 合计)"""
+        start = end - np.timedelta64(window_days, "D")
+        left = int(np.searchsorted(self.trade_dates, start, side="right"))
+        right = int(np.searchsorted(self.trade_dates, end, side="right"))
+        if right <= left:
+            return 0, 0.0
+        total = self.foreign_cumsum[right] - self.foreign_cumsum[left]
+        return right - left, float(total)
+
+
 class LayeredExitStrategy(BaseExitStrategy):
     """
     6层退出策略 - 混合使用Score Utils和技术指标
@@ -47,6 +146,180 @@ class LayeredExitStrategy(BaseExitStrategy):
         self.use_score_utils = use_score_utils
         self.trail_mult = trailing_atr_mult
         self.review_days = review_days
+        self._contexts: Dict[str, LayeredExitContext] = {}
+    
+    def prime_exit_context(
+        self,
+        *,
+        ticker: str,
+        features: pd.DataFrame,
+        trades: Optional[pd.DataFrame] = None,
+        financials: Optional[pd.DataFrame] = None,
+        **_unused: Any
+    ) -> bool:
+        """
+        为回测预计算单只股票的逐bar退出信号
+
+        Returns:
+            True表示预计算成功，之后该ticker的generate_exit_signal走查表路径
+        """
+        context = self.precompute_context(features, trades, financials)
+        if context is None:
+            self._contexts.pop(ticker, None)
+            return False
+        self._contexts[ticker] = context
+        return True
+    
+    def precompute_context(
+        self,
+        df_features: pd.DataFrame,
+        df_trades: Optional[pd.DataFrame] = None,
+        df_financials: Optional[pd.DataFrame] = None
+    ) -> Optional[LayeredExitContext]:
+        """整段计算与持仓无关的各层结果；数据不满足条件时返回None（回退逐日计算）"""
+        
+        if df_features.empty or not isinstance(df_features.index, pd.DatetimeIndex):
+            return None
+        if not (df_features.index.is_monotonic_increasing and df_features.index.is_unique):
+            return None
+        required = {"Close", "ATR", "EMA_50", "EMA_200", "RSI", "MACD_Hist"}
+        if len(df_features) >= 20:
+            required.add("Volume")
+        if self.use_score_utils:
+            required.update(TECHNICAL_SCORE_COLUMNS)
+        if not required.issubset(df_features.columns):
+            return None
+        
+        trades = df_trades if df_trades is not None else pd.DataFrame()
+        if not trades.empty and not {"EnDate", "FrgnBal"}.issubset(trades.columns):
+            return None
+        financials = df_financials if df_financials is not None else pd.DataFrame()
+        if len(financials) >= 2 and "DiscDate" not in financials.columns:
+            return None
+        
+        dates = df_features.index.to_numpy(dtype="datetime64[ns]")
+        close = _float_values(df_features, "Close")
+        
+        # 外资流向前缀和，窗口合计=两次searchsorted+一次相减
+        if trades.empty:
+            trade_dates = np.array([], dtype="datetime64[ns]")
+            foreign = np.array([], dtype="float64")
+        else:
+            trade_dates_series = pd.to_datetime(trades["EnDate"], errors="coerce")
+            valid = trade_dates_series.notna().to_numpy()
+            order = np.argsort(trade_dates_series.to_numpy(dtype="datetime64[ns]")[valid], kind="stable")
+            trade_dates = trade_dates_series.to_numpy(dtype="datetime64[ns]")[valid][order]
+            foreign = _float_values(trades, "FrgnBal")[valid][order]
+        foreign_cumsum = np.concatenate(([0.0], np.cumsum(np.nan_to_num(foreign, nan=0.0))))
+        
+        context = LayeredExitContext(
+            dates=dates,
+            close=close,
+            atr=_float_values(df_features, "ATR"),
+            ema200=_float_values(df_features, "EMA_200"),
+            macd_hist=_float_values(df_features, "MACD_Hist"),
+            exodus=np.zeros(len(dates), dtype=bool),
+            trend_breakdown=detect_trend_breakdown_series(df_features).to_numpy(),
+            weakness=np.full(len(dates), None, dtype=object),
+            composite=None,
+            trade_dates=trade_dates,
+            foreign_cumsum=foreign_cumsum,
+            priority_layer=np.zeros(len(dates), dtype=np.int8),
+        )
+        
+        # Layer 1: 14天外资净卖出（与 detect_institutional_exodus 默认参数一致）
+        left = np.searchsorted(trade_dates, dates - np.timedelta64(14, "D"), side="right")
+        right = np.searchsorted(trade_dates, dates, side="right")
+        net_foreign = foreign_cumsum[right] - foreign_cumsum[left]
+        context.exodus = (right > left) & (net_foreign < -50_000_000)
+        
+        # Layer 3: 恶化需要≥2个维度，且每个维度都要求当前bar已转弱，
+        # 当前bar转弱维度不足2个时无论入场状态如何都不会触发
+        left_30 = np.searchsorted(trade_dates, dates - np.timedelta64(30, "D"), side="right")
+        current_foreign = foreign_cumsum[right] - foreign_cumsum[left_30]
+        current_weak = (
+            (close < context.ema200).astype(int)
+            + (context.macd_hist < 0).astype(int)
+            + ((right > left_30) & (current_foreign < -30_000_000)).astype(int)
+        )
+        deterioration_possible = current_weak >= 2
+        
+        # Layer 4 / Layer 6: 多维弱化与综合分数
+        if self.use_score_utils:
+            breakdown = pd.DataFrame(
+                {
+                    "technical": calculate_technical_score_series(df_features),
+                    "institutional": calculate_institutional_score_series(
+                        df_features.index, trades
+                    ),
+                    "fundamental": calculate_fundamental_score_series(
+                        df_features.index, financials
+                    ),
+                    "volatility": calculate_volatility_score_series(df_features),
+                },
+                index=df_features.index,
+            )
+            components = {
+                name: breakdown[name].to_numpy(dtype="float64")
+                for name in ("technical", "institutional", "fundamental", "volatility")
+            }
+            # 与逐日 calculate_composite_score 相同的默认加权函数，权重只在scoring_utils定义
+            context.composite = _DEFAULT_SCORE_COMBINER(
+                components["technical"],
+                components["institutional"],
+                components["fundamental"],
+                components["volatility"],
+            )
+            weak_count = (
+                (components["technical"] < 35).astype(int)
+                + (components["institutional"] < 30).astype(int)
+                + (components["fundamental"] < 35).astype(int)
+            )
+            for row in np.flatnonzero(weak_count >= 2):
+                context.weakness[row] = self._weakness_from_breakdown(
+                    {name: values[row] for name, values in components.items()}
+                )
+        else:
+            rsi = _float_values(df_features, "RSI")
+            ema50 = _float_values(df_features, "EMA_50")
+            issue_count = (
+                (rsi < 35).astype(int)
+                + (close < ema50).astype(int)
+                + (context.macd_hist < 0).astype(int)
+            )
+            for row in np.flatnonzero(issue_count >= 2):
+                context.weakness[row] = self._weakness_from_latest(
+                    {
+                        "RSI": rsi[row],
+                        "Close": close[row],
+                        "EMA_50": ema50[row],
+                        "MACD_Hist": context.macd_hist[row],
+                    }
+                )
+        
+        context.priority_layer = np.select(
+            [
+                context.exodus,
+                context.trend_breakdown.astype(bool),
+                deterioration_possible,
+                context.weakness.astype(bool),
+            ],
+            [1, 2, 3, 4],
+            default=0,
+        ).astype(np.int8)
+        return context
+    
+    def _locate_context(
+        self,
+        market_data: MarketData
+    ) -> Tuple[Optional[LayeredExitContext], int]:
+        context = self._contexts.get(market_data.ticker)
+        if context is None:
+            return None, -1
+        row = context.locate(market_data)
+        if row is None:
+            return None, -1
+        return context, row
     
     def generate_exit_signal(
         self,
@@ -55,10 +328,93 @@ class LayeredExitStrategy(BaseExitStrategy):
     ) -> TradingSignal:
         """6层退出逻辑"""
         
-        self.update_position(position, market_data.latest_price)
+        context, row = self._locate_context(market_data)
+        if context is not None:
+            # 峰值取收盘价累计最大值，不再逐bar回写position
+            peak_price = position.peak_price_since_entry
+            peak_close = context.peak_close(position.entry_date, row)
+            if peak_close > peak_price:
+                peak_price = peak_close
+        else:
+            self.update_position(position, market_data.latest_price)
+            peak_price = position.peak_price_since_entry
+        
+        # 预计算表明Layer 1-4当前bar不可能触发时直接跳过（多数bar为HOLD）
+        if context is None or context.priority_layer[row]:
+            signal = self._check_priority_layers(position, market_data, context, row)
+            if signal is not None:
+                return signal
+        
+        # Layer 5: Trailing Stop
+        if context is not None:
+            latest_close, latest_atr = context.close[row], context.atr[row]
+        elif not market_data.df_features.empty:
+            latest = market_data.df_features.iloc[-1]
+            latest_close, latest_atr = latest['Close'], latest['ATR']
+        else:
+            latest_close = latest_atr = None
+        if latest_close is not None:
+            trail_level = peak_price - (latest_atr * self.trail_mult)
+            
+            if latest_close < trail_level:
+                profit_pct = ((peak_price / position.decision_entry_price) - 1) * 100
+                return TradingSignal(
+                    action=SignalAction.SELL,
+                    confidence=0.75,
+                    reasons=[f"Trailing stop (peak profit +{profit_pct:.1f}%)"],
+                    metadata={"trigger": "Layer5_TrailingStop"},
+                    strategy_name=self.strategy_name
+                )
+        
+        # Layer 6: Time Review
+        if context is not None:
+            days_held_values, review_mask = context.review_calendar(position.entry_date, self.review_days)
+            days_held = int(days_held_values[row])
+            is_review_day = bool(review_mask[row])
+        else:
+            days_held = (market_data.current_date - position.entry_date).days
+            is_review_day = days_held > 0 and days_held % self.review_days == 0
+        if is_review_day:
+            review = self._quarterly_review(position, market_data, context, row)
+            if review:
+                return TradingSignal(
+                    action=SignalAction.SELL,
+                    confidence=0.7,
+                    reasons=[review],
+                    metadata={
+                        "trigger": "Layer6_TimeReview",
+                        "days_held": days_held
+                    },
+                    strategy_name=self.strategy_name
+                )
+        
+        # All Clear
+        return TradingSignal(
+            action=SignalAction.HOLD,
+            confidence=0.0,
+            reasons=["All 6 layers clear"],
+            metadata={"days_held": days_held},
+            strategy_name=self.strategy_name
+        )
+    
+    def _check_priority_layers(
+        self,
+        position: Position,
+        market_data: MarketData,
+        context: Optional[LayeredExitContext],
+        row: int
+    ) -> Optional[TradingSignal]:
+        """Layer 1-4（按优先级依次检查），均未触发时返回None"""
+        
+        # 有预计算时从第一个可能触发的层开始，之前的层已知不会触发
+        first_layer = int(context.priority_layer[row]) if context is not None else 1
         
         # Layer 1: Emergency - 机构大举撤离
-        if detect_institutional_exodus(market_data.df_trades, market_data.current_date):
+        if context is not None:
+            exodus = first_layer == 1
+        else:
+            exodus = detect_institutional_exodus(market_data.df_trades, market_data.current_date)
+        if exodus:
             return TradingSignal(
                 action=SignalAction.SELL,
                 confidence=1.0,
@@ -68,7 +424,10 @@ class LayeredExitStrategy(BaseExitStrategy):
             )
         
         # Layer 2: Trend Breakdown
-        trend_break = detect_trend_breakdown(market_data.df_features)
+        if context is not None:
+            trend_break = context.trend_breakdown[row] if first_layer == 2 else None
+        else:
+            trend_break = detect_trend_breakdown(market_data.df_features)
         if trend_break:
             return TradingSignal(
                 action=SignalAction.SELL,
@@ -79,7 +438,10 @@ class LayeredExitStrategy(BaseExitStrategy):
             )
         
         # Layer 3: Market Deterioration（对比入场状态）
-        deterioration = self._check_deterioration(position, market_data)
+        if first_layer <= 3:
+            deterioration = self._check_deterioration(position, market_data, context, row)
+        else:
+            deterioration = None
         if deterioration:
             return TradingSignal(
                 action=SignalAction.SELL,
@@ -90,7 +452,10 @@ class LayeredExitStrategy(BaseExitStrategy):
             )
         
         # Layer 4: Multi-Dimensional Weakness (可选使用Score Utils)
-        weakness = self._check_weakness(market_data)
+        if context is not None:
+            weakness = context.weakness[row]
+        else:
+            weakness = self._check_weakness(market_data)
         if weakness:
             return TradingSignal(
                 action=SignalAction.SELL,
@@ -100,53 +465,48 @@ class LayeredExitStrategy(BaseExitStrategy):
                 strategy_name=self.strategy_name
             )
         
-        # Layer 5: Trailing Stop
-        if not market_data.df_features.empty:
-            latest = market_data.df_features.iloc[-1]
-            trail_level = position.peak_price_since_entry - (latest['ATR'] * self.trail_mult)
-            
-            if latest['Close'] < trail_level:
-                profit_pct = position.peak_pnl_pct()
-                return TradingSignal(
-                    action=SignalAction.SELL,
-                    confidence=0.75,
-                    reasons=[f"Trailing stop (peak profit +{profit_pct:.1f}%)"],
-                    metadata={"trigger": "Layer5_TrailingStop"},
-                    strategy_name=self.strategy_name
-                )
-        
-        # Layer 6: Time Review
-        days_held = (market_data.current_date - position.entry_date).days
-        if days_held > 0 and days_held % self.review_days == 0:
-            review = self._quarterly_review(position, market_data)
-            if review:
-                return TradingSignal(
-                    action=SignalAction.SELL,
-                    confidence=0.7,
-                    reasons=[review],
-                    metadata={
-                        "trigger": "Layer6_TimeReview",
-                        "days_held": days_held
-                    },
-                    strategy_name=self.strategy_name
-                )
-        
-        # All Clear
-        return TradingSignal(
-            action=SignalAction.HOLD,
-            confidence=0.0,
-            reasons=["All 6 layers clear"],
-            metadata={"days_held": days_held},
-            strategy_name=self.strategy_name
-        )
+        return None
     
     def _check_deterioration(
         self,
         position: Position,
-        market_data: MarketData
+        market_data: MarketData,
+        context: Optional[LayeredExitContext] = None,
+        row: int = -1
     ) -> Optional[str]:
         """检测市场恶化（对比入场状态）"""
         
+        if context is not None:
+            if row + 1 < 10:
+                return None
+            entry_date = np.datetime64(pd.Timestamp(position.entry_date), "ns")
+            entry_idx = min(
+                int(np.searchsorted(context.dates, entry_date, side="right")) - 1,
+                row,
+            )
+            if entry_idx < 0:
+                return None
+            # 交易数据只截到当前日，入场窗口不能越过当前日
+            current = context.dates[row]
+            entry_count, entry_foreign = context.foreign_window(min(entry_date, current), 30)
+            current_count, current_foreign = context.foreign_window(current, 30)
+            if entry_count == 0 or current_count == 0:
+                entry_foreign = current_foreign = None
+            return market_deterioration_message(
+                {
+                    "Close": context.close[entry_idx],
+                    "EMA_200": context.ema200[entry_idx],
+                    "MACD_Hist": context.macd_hist[entry_idx],
+                },
+                {
+                    "Close": context.close[row],
+                    "EMA_200": context.ema200[row],
+                    "MACD_Hist": context.macd_hist[row],
+                },
+                entry_foreign,
+                current_foreign,
+            )
+        
         df = market_data.df_features
         if len(df) < 10:
             return None
@@ -180,42 +540,48 @@ class LayeredExitStrategy(BaseExitStrategy):
                 market_data.metadata,
                 current_date=market_data.current_date
             )
-            
-            weak_components = []
-            if breakdown['technical'] < 35:
-                weak_components.append(f"Technical({breakdown['technical']:.0f})")
-            if breakdown['institutional'] < 30:
-                weak_components.append(f"Institutional({breakdown['institutional']:.0f})")
-            if breakdown['fundamental'] < 35:
-                weak_components.append(f"Fundamental({breakdown['fundamental']:.0f})")
-            
-            if len(weak_components) >= 2:
-                return f"Multi-weakness: {', '.join(weak_components)} scores low"
+            return self._weakness_from_breakdown(breakdown)
         
-        else:
-            # 不使用Score Utils，直接检测技术指标
-            if market_data.df_features.empty:
-                return None
-            
-            latest = market_data.df_features.iloc[-1]
-            issues = []
-            
-            if latest['RSI'] < 35:
-                issues.append("Weak RSI")
-            if latest['Close'] < latest['EMA_50']:
-                issues.append("Below EMA50")
-            if latest['MACD_Hist'] < 0:
-                issues.append("Negative MACD")
-            
-            if len(issues) >= 2:
-                return "Technical weakness: " + " + ".join(issues)
+        # 不使用Score Utils，直接检测技术指标
+        if market_data.df_features.empty:
+            return None
+        return self._weakness_from_latest(market_data.df_features.iloc[-1])
+    
+    @staticmethod
+    def _weakness_from_breakdown(breakdown) -> Optional[str]:
+        weak_components = []
+        if breakdown['technical'] < 35:
+            weak_components.append(f"Technical({breakdown['technical']:.0f})")
+        if breakdown['institutional'] < 30:
+            weak_components.append(f"Institutional({breakdown['institutional']:.0f})")
+        if breakdown['fundamental'] < 35:
+            weak_components.append(f"Fundamental({breakdown['fundamental']:.0f})")
         
+        if len(weak_components) >= 2:
+            return f"Multi-weakness: {', '.join(weak_components)} scores low"
+        return None
+    
+    @staticmethod
+    def _weakness_from_latest(latest) -> Optional[str]:
+        issues = []
+        
+        if latest['RSI'] < 35:
+            issues.append("Weak RSI")
+        if latest['Close'] < latest['EMA_50']:
+            issues.append("Below EMA50")
+        if latest['MACD_Hist'] < 0:
+            issues.append("Negative MACD")
+        
+        if len(issues) >= 2:
+            return "Technical weakness: " + " + ".join(issues)
         return None
     
     def _quarterly_review(
         self,
         position: Position,
-        market_data: MarketData
+        market_data: MarketData,
+        context: Optional[LayeredExitContext] = None,
+        row: int = -1
     ) -> Optional[str]:
         """季度审查"""
         
@@ -223,13 +589,16 @@ class LayeredExitStrategy(BaseExitStrategy):
         
         if self.use_score_utils:
             # 使用Score Utils
-            score, _ = calculate_composite_score(
-                market_data.df_features,
-                market_data.df_trades,
-                market_data.df_financials,
-                market_data.metadata,
-                current_date=market_data.current_date
-            )
+            if context is not None and context.composite is not None:
+                score = context.composite[row]
+            else:
+                score, _ = calculate_composite_score(
+                    market_data.df_features,
+                    market_data.df_trades,
+                    market_data.df_financials,
+                    market_data.metadata,
+                    current_date=market_data.current_date
+                )
             
             # 亏损且分数低 → 退出
             if current_pnl < 0 and score < 55:
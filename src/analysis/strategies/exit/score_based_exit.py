@@ -6,7 +6,7 @@
 
 from ..base_exit_strategy import BaseExitStrategy
 from ...signals import TradingSignal, SignalAction, MarketData, Position
-from ...scoring_utils import calculate_composite_score
+from ...scoring_utils import calculate_composite_score, make_score_combiner
 
 
 class ScoreBasedExitStrategy(BaseExitStrategy):
@@ -40,6 +40,7 @@ class ScoreBasedExitStrategy(BaseExitStrategy):
             "fundamental": 0.2,
             "volatility": 0.1
         }
+        self._combine_scores = make_score_combiner(self.weights)
     
     def generate_exit_signal(
         self,
@@ -57,8 +58,8 @@ class ScoreBasedExitStrategy(BaseExitStrategy):
             market_data.df_trades,
             market_data.df_financials,
             market_data.metadata,
-            weights=self.weights,
-            current_date=market_data.current_date
+            current_date=market_data.current_date,
+            combine=self._combine_scores
         )
         
         # 获取入场时的分数（从entry_signal的metadata中）
@@ -20,6 +20,8 @@ from typing import Dict, List, Optional
 
 import pandas as pd
 
+from src.analysis.scoring_utils import prepare_earnings_dates, prepare_financials
+
 logger = logging.getLogger(__name__)
 
 
@@ -161,7 +163,7 @@ class BacktestDataCache:
 
         try:
             with open(metadata_path, "r", encoding="utf-8") as f:
-                self.metadata_cache[ticker] = json.load(f)
+                self.metadata_cache[ticker] = prepare_earnings_dates(json.load(f))
             return True
         except Exception as e:
             logger.debug(f"Failed to load metadata for {ticker}: {e}")
@@ -221,7 +223,8 @@ class BacktestDataCache:
                     if end_date:
                         df = df[df["DiscDate"] <= pd.Timestamp(end_date)]
 
-            self.financials_cache[ticker] = df
+            # 按披露日排序、打分数值列转float，回测中每个bar不再重复处理
+            self.financials_cache[ticker] = prepare_financials(df)
             return True
         except Exception as e:
             logger.debug(f"Failed to load financials for {ticker}: {e}")
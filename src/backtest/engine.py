@@ -14,6 +14,7 @@ import numpy as np
 from src.analysis.strategies.base_entry_strategy import BaseEntryStrategy
 from src.analysis.strategies.base_exit_strategy import BaseExitStrategy
 from src.analysis.signals import TradingSignal, SignalAction, MarketData, Position
+from src.analysis.scoring_utils import prepare_earnings_dates, prepare_financials
 from src.signal_generator import generate_signal_v2
 from src.backtest.models import Trade, BacktestResult
 from src.backtest.lot_size_manager import LotSizeManager
@@ -105,24 +106,25 @@ class BacktestEngine:
             # Filter to TSEPrime section only (most stocks are here)
             if 'Section' in df_trades.columns:
                 df_trades = df_trades[df_trades['Section'] == 'TSEPrime'].copy()
-            # Convert dates but keep as columns (scorer expects EnDate column)
+            # Convert dates but keep as columns (scorer expects EnDate column);
+            # sorted once so per-day prefixes are a searchsorted slice
             df_trades['EnDate'] = pd.to_datetime(df_trades['EnDate'])
+            df_trades = df_trades.sort_values('EnDate', kind='stable')
         else:
             df_trades = pd.DataFrame()
         
         # Load financials (quarterly) - keep original format for scorer
         financials_path = self.data_root / 'raw_financials' / f"{ticker}_financials.parquet"
         if financials_path.exists():
-            df_financials = pd.read_parquet(financials_path)
-            # Convert dates but keep as columns (scorer expects DiscDate column)
-            df_financials['DiscDate'] = pd.to_datetime(df_financials['DiscDate'])
+            # Dates parsed, sorted and score columns cast once (DiscDate stays a column)
+            df_financials = prepare_financials(pd.read_parquet(financials_path))
         else:
             df_financials = pd.DataFrame()
         
         # Load metadata
         metadata_path = self.data_root / 'metadata' / f"{ticker}_metadata.json"
         with open(metadata_path, 'r', encoding='utf-8') as f:
-            metadata = json.load(f)
+            metadata = prepare_earnings_dates(json.load(f))
         
         return df_features, df_trades, df_financials, metadata
     
@@ -184,14 +186,27 @@ class BacktestEngine:
 
         # Day-by-day simulation
         trading_days = df_features.index.tolist()
+        features_sorted = df_features.index.is_monotonic_increasing and df_features.index.is_unique
+        trade_dates = df_trades['EnDate'].to_numpy() if not df_trades.empty else None
+        financial_dates = df_financials['DiscDate'].to_numpy() if not df_financials.empty else None
         
         for i, current_date in enumerate(trading_days):
             # Get data UP TO current date (NO FUTURE PEEKING!)
-            df_features_historical = df_features[df_features.index <= current_date]
+            if features_sorted:
+                df_features_historical = df_features.iloc[:i + 1]
+            else:
+                df_features_historical = df_features[df_features.index <= current_date]
             
-            # Filter trades/financials by their date columns (keep original format for scorer)
-            df_trades_historical = df_trades[df_trades['EnDate'] <= current_date] if not df_trades.empty else pd.DataFrame()
-            df_financials_historical = df_financials[df_financials['DiscDate'] <= current_date] if not df_financials.empty else pd.DataFrame()
+            # Trades/financials are sorted at load: the history is a prefix (keep original format for scorer)
+            current_day = np.datetime64(current_date)
+            if trade_dates is not None:
+                df_trades_historical = df_trades.iloc[:trade_dates.searchsorted(current_day, side='right')]
+            else:
+                df_trades_historical = pd.DataFrame()
+            if financial_dates is not None:
+                df_financials_historical = df_financials.iloc[:financial_dates.searchsorted(current_day, side='right')]
+            else:
+                df_financials_historical = pd.DataFrame()
             
             current_close = df_features.loc[current_date, 'Close']
             current_open = df_features.loc[current_date, 'Open']
@@ -8,7 +8,7 @@ from datetime import datetime
 import pandas as pd
 
 
-@dataclass
+@dataclass(slots=True)
 class Position:
     """
     单个股票持仓
@@ -13,6 +13,7 @@ import pandas as pd
 
 from ..analysis.signals import MarketData, SignalAction, TradingSignal
 from ..analysis.filters import EntrySecondaryFilter
+from ..analysis.scoring_utils import prepare_earnings_dates, prepare_financials
 from ..analysis.strategies.base_entry_strategy import BaseEntryStrategy
 from ..analysis.strategies.base_exit_strategy import BaseExitStrategy
 from ..capacity import (
@@ -260,6 +261,18 @@ class PortfolioBacktestEngine:
                 tickers, entry_strategy, exit_strategy, start_date, end_date
             )
 
+        # 出场策略可选：整段预计算与持仓无关的逐bar信号，日内循环只查表
+        prime_exit_context = getattr(exit_strategy, "prime_exit_context", None)
+        if callable(prime_exit_context):
+            for ticker, data in all_data.items():
+                prime_exit_context(
+                    ticker=ticker,
+                    features=data["features"],
+                    trades=data.get("trades"),
+                    financials=data.get("financials"),
+                    metadata=data.get("metadata"),
+                )
+
         # 获取交易日历（取所有股票的交易日并集）
         trading_days = self._get_trading_calendar(all_data, start_date, end_date)
 
@@ -1146,15 +1159,15 @@ class PortfolioBacktestEngine:
         if market_data is None or self.capacity_regime is None:
             return None
 
-        latest_features = market_data.latest_features
-        if latest_features.empty:
+        df_features = market_data.df_features
+        if df_features.empty:
             return None
 
         turnover_field = self.capacity_regime.turnover_field
-        if turnover_field not in latest_features.index:
+        if turnover_field not in df_features.columns:
             return None
 
-        value = latest_features.get(turnover_field)
+        value = df_features[turnover_field].iat[-1]
         if pd.isna(value):
             return None
         return float(value)
@@ -1427,7 +1440,11 @@ class PortfolioBacktestEngine:
         if need_financials and financials_path.exists():
             df_financials = pd.read_parquet(financials_path)
 
-        metadata = data_manager.load_metadata(ticker) if need_metadata else {}
+        metadata = (
+            prepare_earnings_dates(data_manager.load_metadata(ticker))
+            if need_metadata
+            else {}
+        )
 
         prepared_trades = self._prepare_trades_fast(df_trades)
         prepared_financials = self._prepare_financials_fast(df_financials)
@@ -1603,12 +1620,7 @@ class PortfolioBacktestEngine:
     def _prepare_financials_fast(self, df_financials: pd.DataFrame) -> pd.DataFrame:
         if df_financials is None or df_financials.empty:
             return pd.DataFrame()
-        df = df_financials
-        if "DiscDate" in df.columns:
-            df = df.copy()
-            df["DiscDate"] = pd.to_datetime(df["DiscDate"])
-            df = df.sort_values("DiscDate")
-        return df
+        return prepare_financials(df_financials)
 
     @staticmethod
     def _extract_date_array(df: pd.DataFrame, column: str):
@@ -10,6 +10,7 @@ from typing import Optional, Dict, Tuple
 import json
 import pandas as pd
 
+from src.analysis.scoring_utils import EARNINGS_DATES_KEY, prepare_earnings_dates
 from src.analysis.signals import MarketData
 
 
@@ -59,7 +60,7 @@ class MarketDataBuilder:
                 df_features=df_features,
                 df_trades=df_trades,
                 df_financials=df_financials,
-                metadata=metadata or {}
+                metadata=MarketDataBuilder._prepare_metadata(metadata)
             )
             
         except Exception as e:
@@ -122,7 +123,7 @@ class MarketDataBuilder:
                 df_features=df_features,
                 df_trades=df_trades,
                 df_financials=df_financials,
-                metadata=metadata
+                metadata=MarketDataBuilder._prepare_metadata(metadata)
             )
             
         except Exception as e:
@@ -163,7 +164,7 @@ class MarketDataBuilder:
             df_features=df_features,
             df_trades=df_trades,
             df_financials=df_financials,
-            metadata=metadata or {}
+            metadata=MarketDataBuilder._prepare_metadata(metadata)
         )
     
     # ================================================================
@@ -238,7 +239,8 @@ class MarketDataBuilder:
         if df_trades.empty:
             return df_trades
         
-        df = df_trades.copy()
+        # 不整表复制：先筛行，日期在独立Series上解析，只给筛出的行赋值
+        df = df_trades
         
         # 过滤到 TSEPrime
         if 'Section' in df.columns:
@@ -246,13 +248,14 @@ class MarketDataBuilder:
         
         # 转换 EnDate 为 datetime64
         if 'EnDate' in df.columns:
-            df['EnDate'] = pd.to_datetime(df['EnDate'])
+            en_dates = pd.to_datetime(df['EnDate'])
             
             # 按日期过滤
             current_ts = pd.Timestamp(current_date)
-            df = df[df['EnDate'] <= current_ts]
+            keep = en_dates <= current_ts
+            df = df[keep].assign(EnDate=en_dates[keep])
         
-        return df
+        return df if df is not df_trades else df_trades.copy()
     
     @staticmethod
     def _prepare_financials(
@@ -276,14 +279,34 @@ class MarketDataBuilder:
         if df_financials.empty:
             return df_financials
         
-        df = df_financials.copy()
-        
-        # 转换 DiscDate 为 datetime64
-        if 'DiscDate' in df.columns:
-            df['DiscDate'] = pd.to_datetime(df['DiscDate'])
+        # 转换 DiscDate 为 datetime64（同 _prepare_trades，不整表复制）
+        if 'DiscDate' in df_financials.columns:
+            disc_dates = pd.to_datetime(df_financials['DiscDate'])
             
             # 按日期过滤
             current_ts = pd.Timestamp(current_date)
-            df = df[df['DiscDate'] <= current_ts]
+            keep = disc_dates <= current_ts
+            return df_financials[keep].assign(DiscDate=disc_dates[keep])
         
-        return df
+        return df_financials.copy()
+    
+    @staticmethod
+    def _prepare_metadata(metadata: Optional[Dict]) -> Dict:
+        """
+        标准化元数据
+        
+        earnings_calendar 预解析为排序后的日期数组（EARNINGS_DATES_KEY），
+        之后 check_earnings_risk 每次只做二分查找。已解析过的直接返回；
+        否则由 prepare_earnings_dates 返回补充后的副本，调用方的字典不变。
+        
+        Args:
+            metadata: 原始元数据（可选）
+            
+        Returns:
+            标准化的元数据
+        """
+        if not metadata:
+            return {}
+        if EARNINGS_DATES_KEY in metadata or 'earnings_calendar' not in metadata:
+            return metadata
+        return prepare_earnings_dates(metadata)
@@ -2230,7 +2230,7 @@ class ReportBuilder:
                                 .split(",")[0]
                                 .strip()
                             )
-                        except:
+                        except (AttributeError, IndexError):
                             pass
 
                 lines.append(
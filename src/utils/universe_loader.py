@@ -30,7 +30,8 @@ def load_tickers_from_file(path: str | Path) -> list[str]:
     if not source.exists():
         raise FileNotFoundError(f"Universe file not found: {source}")
 
-    if source.suffix.lower() == ".json":
+    suffix = source.suffix.lower()
+    if suffix == ".json":
         payload = json.loads(source.read_text(encoding="utf-8"))
         raw_items: object
         if isinstance(payload, dict):
@@ -49,7 +50,7 @@ def load_tickers_from_file(path: str | Path) -> list[str]:
                     tickers.append(normalized)
         return _dedupe(tickers)
 
-    if source.suffix.lower() == ".csv":
+    if suffix == ".csv":
         frame = pd.read_csv(source)
         for column in ["code", "Code", "ticker", "Ticker", "symbol", "Symbol"]:
             if column in frame.columns:
@@ -1,12 +1,16 @@
 import math
 
+import numpy as np
 import pytest
 
 from src.analysis.strategies.entry.crossover_utils import (
     crossed_up,
+    golden_cross_last,
+    golden_cross_mask,
     gt_latest,
     macd_position_ok,
     rsi_not_overheated,
+    tail_rise,
     volume_ratio_ok,
 )
 
@@ -21,6 +25,20 @@ def test_crossed_up_rejects_missing_or_non_cross() -> None:
     assert not crossed_up(math.nan, 0.1, 0.3, 0.2)
 
 
+def test_histogram_golden_cross_helpers() -> None:
+    hist = np.array([0.2, -0.1, 0.3, math.nan, 0.1, -0.2, 0.0, 0.4])
+
+    assert golden_cross_mask(hist).tolist() == [
+        False, False, True, False, False, False, False, False,
+    ]
+    assert golden_cross_last(hist[:3])
+    assert not golden_cross_last(hist[:5])
+    assert not golden_cross_last(hist)
+    assert not golden_cross_last(hist[:1])
+    for end in range(1, len(hist) + 1):
+        assert golden_cross_last(hist[:end]) == golden_cross_mask(hist[:end])[-1]
+
+
 def test_basic_rule_helpers() -> None:
     assert gt_latest(11.0, 10.0)
     assert volume_ratio_ok(130.0, 100.0, 1.2)
@@ -36,3 +54,11 @@ def test_macd_position_modes() -> None:
 
     with pytest.raises(ValueError):
         macd_position_ok(0.1, 0.0, mode="bad")
+
+
+def test_tail_rise_skips_nan_steps_and_reports_slope() -> None:
+    values = np.array([5.0, -0.3, -0.2, math.nan, -0.1, 0.0])
+
+    assert tail_rise(values, 5) == (True, pytest.approx(0.3))
+    assert tail_rise(values, 6) == (False, pytest.approx(-5.0))
+    assert tail_rise(values[:1], 5) == (False, 0.0)
@@ -1,4 +1,7 @@
+import pandas as pd
+
 from src.analysis.filters.entry_secondary_filter import EntrySecondaryFilter
+from src.analysis.signals import MarketData
 from src.cli.evaluate import _resolve_entry_filter_variants
 
 
@@ -61,6 +64,38 @@ def test_entry_filter_allows_unbounded_atr_max() -> None:
     assert not entry_filter.passes_latest({"Close": 1000.0, "ATR_Ratio": 0.014})
 
 
+def test_entry_filter_passes_reads_latest_row_from_frame() -> None:
+    entry_filter = EntrySecondaryFilter.from_dict({"enabled": True, "atr_price_max": 0.03})
+    frame = pd.DataFrame(
+        {
+            "Close": [900.0, 1200.0, 1200.0, 1200.0],
+            "EMA_20": [1.0, 1150.0, 1150.0, 1150.0],
+            "EMA_50": [1.0, 1100.0, 1100.0, 1160.0],
+            "EMA_200": [1.0, 1000.0, 1000.0, 1000.0],
+            "RSI": [60.0, 60.0, 80.0, 60.0],
+            "ATR": [10.0, 24.0, 24.0, 24.0],
+            "Sector": ["a", "b", "c", "d"],
+        },
+        index=pd.date_range("2026-01-05", periods=4, freq="B"),
+    )
+
+    results = []
+    for row_pos in range(len(frame)):
+        market_data = MarketData(
+            ticker="7203",
+            current_date=frame.index[row_pos],
+            df_features=frame.iloc[: row_pos + 1],
+            df_trades=pd.DataFrame(),
+            df_financials=pd.DataFrame(),
+            metadata={},
+        )
+        result = entry_filter.passes(market_data)
+        assert result == entry_filter.passes_latest(frame.iloc[row_pos])
+        results.append(result)
+
+    assert results == [False, True, False, False]
+
+
 def test_atr_entry_filter_mode_uses_only_atr_bounds() -> None:
     variants = _resolve_entry_filter_variants(
         {
@@ -2,17 +2,27 @@ from __future__ import annotations
 
 import math
 
+import numpy as np
 import pandas as pd
 import pytest
 
 from src.analysis.signals import MarketData, SignalAction, TradingSignal
 from src.analysis.strategies.entry.bollinger_squeeze_strategy import (
     BollingerSqueezeStrategy,
+    _rolling_non_null_percentile,
 )
 from src.analysis.strategies.entry.immediate_rebound_entry import (
     IMMEDIATE_REBOUND_ENTRY_NAMES,
 )
 from src.analysis.strategies.entry.ichimoku_stoch_strategy import IchimokuStochStrategy
+from src.analysis.strategies.entry.macd_crossover import MACDCrossoverStrategy
+from src.analysis.strategies.entry.macd_crossover_enhanced_a2 import (
+    MACDCrossoverEnhancedA2,
+    MACDCrossoverEnhancedA2_V11,
+)
+from src.analysis.strategies.entry.macd_enhanced_fundamental import (
+    MACDEnhancedFundamentalStrategy,
+)
 from src.analysis.strategies.entry.rule_based_crossover_entry import (
     CrossTrendMACDVolumeEntry,
     CrossTrendMACDVolumeLooseEntry,
@@ -151,6 +161,73 @@ def test_cross_trend_macd_volume_precompute_matches_daily_signal() -> None:
     _assert_precompute_matches_daily(CrossTrendMACDVolumeLooseEntry(), features)
 
 
+def test_macd_crossover_precompute_matches_daily_signal() -> None:
+    dates = pd.bdate_range("2026-01-01", periods=40)
+    macd_hist = [(-1.0 if (index // 3) % 2 == 0 else 1.0) * (0.1 + index / 100) for index in range(40)]
+    volume = [100.0 + (index % 5) * 30 for index in range(40)]
+    volume_sma = [float("nan")] * 25 + [110.0] * 15
+    close = [100.0 + (index % 7) for index in range(40)]
+    features = pd.DataFrame(
+        {
+            "Close": close,
+            "EMA_200": [103.0] * 40,
+            "MACD": [0.5] * 40,
+            "MACD_Signal": [0.4] * 40,
+            "MACD_Hist": macd_hist,
+            "Volume": volume,
+            "Volume_SMA_20": volume_sma,
+        },
+        index=dates,
+    )
+
+    _assert_precompute_matches_daily(MACDCrossoverStrategy(), features)
+    _assert_precompute_matches_daily(MACDCrossoverStrategy(min_confidence=0.5), features)
+    _assert_precompute_matches_daily(
+        MACDCrossoverStrategy(confirm_with_volume=False, confirm_with_trend=False),
+        features,
+    )
+
+
+def test_macd_enhanced_precompute_matches_daily_signal() -> None:
+    dates = pd.bdate_range("2026-01-01", periods=80)
+    macd_hist = [(-1.0 if (index // 4) % 2 == 0 else 1.0) * (0.1 + index / 100) for index in range(80)]
+    volume = [100.0 + (index % 5) * 30 for index in range(80)]
+    close = [100.0 - (index % 30) * 0.6 for index in range(80)]
+    features = pd.DataFrame(
+        {
+            "Close": close,
+            "EMA_200": [95.0] * 80,
+            "SMA_25": [100.0] * 80,
+            "MACD": [0.5] * 80,
+            "MACD_Signal": [0.4] * 80,
+            "MACD_Hist": macd_hist,
+            "Volume": volume,
+        },
+        index=dates,
+    )
+
+    _assert_precompute_matches_daily(MACDCrossoverEnhancedA2(), features)
+    _assert_precompute_matches_daily(MACDCrossoverEnhancedA2_V11(min_confidence=0.5), features)
+    _assert_precompute_matches_daily(MACDEnhancedFundamentalStrategy(), features)
+
+
+def test_macd_enhanced_golden_cross_treats_object_none_as_missing() -> None:
+    strategy = MACDEnhancedFundamentalStrategy()
+    missing = pd.DataFrame({"MACD_Hist": pd.Series([-0.1, None], dtype=object)})
+    crossed = pd.DataFrame({"MACD_Hist": pd.Series([-0.1, 0.2], dtype=object)})
+
+    assert strategy._check_macd_golden_cross(missing) is False
+    assert strategy._check_macd_golden_cross(crossed) is True
+
+
+def test_macd_enhanced_relative_strength_treats_object_none_price_as_missing() -> None:
+    strategy = MACDEnhancedFundamentalStrategy()
+    close = pd.Series([None] + [100.0] * 19, dtype=object)
+    features = pd.DataFrame({"Close": close}, index=pd.bdate_range("2026-01-01", periods=20))
+
+    assert strategy._score_relative_strength_continuous(features, None) == 0.0
+
+
 def test_bollinger_squeeze_precompute_matches_daily_signal() -> None:
     dates = pd.bdate_range("2026-01-01", periods=55)
     features = pd.DataFrame(
@@ -168,6 +245,49 @@ def test_bollinger_squeeze_precompute_matches_daily_signal() -> None:
     _assert_precompute_matches_daily(BollingerSqueezeStrategy(), features)
 
 
+def _rolling_non_null_percentile_reference(
+    series: pd.Series,
+    *,
+    percentile: float,
+    window: int,
+    min_history: int = 20,
+) -> tuple[pd.Series, pd.Series]:
+    history: list[float] = []
+    thresholds: list[float] = []
+    counts: list[int] = []
+    for value in pd.to_numeric(series, errors="coerce"):
+        if pd.notna(value):
+            history.append(float(value))
+        counts.append(len(history))
+        if len(history) >= min_history:
+            thresholds.append(float(np.percentile(history[-window:], percentile)))
+        else:
+            thresholds.append(np.nan)
+    return (
+        pd.Series(thresholds, index=series.index, dtype="float64"),
+        pd.Series(counts, index=series.index, dtype="int64"),
+    )
+
+
+@pytest.mark.parametrize("window", [100, 25, 20, 10])
+def test_rolling_non_null_percentile_matches_row_by_row_loop(window: int) -> None:
+    rng = np.random.default_rng(window)
+    values = np.abs(rng.normal(0.1, 0.03, 260))
+    values[rng.random(260) < 0.2] = np.nan
+    values[30:45] = np.nan
+    series = pd.Series(values, index=pd.bdate_range("2025-01-01", periods=260))
+    assert series.count() > 100
+
+    thresholds, counts = _rolling_non_null_percentile(series, percentile=20, window=window)
+    expected_thresholds, expected_counts = _rolling_non_null_percentile_reference(
+        series, percentile=20, window=window
+    )
+
+    pd.testing.assert_series_equal(thresholds, expected_thresholds, check_exact=True)
+    pd.testing.assert_series_equal(counts, expected_counts, check_exact=True)
+    assert thresholds.notna().any()
+
+
 def test_ichimoku_stoch_precompute_matches_daily_signal() -> None:
     dates = pd.bdate_range("2026-01-01", periods=35)
     stoch_k = [50.0] * 33 + [20.0, 25.0]
@@ -238,6 +358,33 @@ def test_scorer_precompute_matches_daily_signal() -> None:
         metadata={},
     )
 
+    earnings_metadata = {
+        "earnings_calendar": [
+            {"Date": "2026-02-02"},
+            {"Date": "2026-01-12"},
+            {"Date": "invalid"},
+        ]
+    }
+    # 低阈值让财报惩罚后的各档分数也产生BUY信号，逐项比对
+    for strategy in (SimpleScorerStrategy(buy_threshold=30), EnhancedScorerStrategy(buy_threshold=30)):
+        _assert_precompute_matches_daily(
+            strategy,
+            features,
+            trades=trades,
+            financials=financials,
+            metadata=earnings_metadata,
+        )
+
+    cache = SimpleScorerStrategy().build_precompute_feature_cache(
+        features=features,
+        trades=trades,
+        financials=financials,
+        metadata={},
+    )
+    assert cache.attrs["valid"]
+    components = cache[["technical", "institutional", "fundamental", "volatility"]]
+    assert (components.dtypes == "float32").all()
+
 
 def test_immediate_rebound_precompute_matches_daily_signal() -> None:
     dates = pd.bdate_range("2026-01-01", periods=30)
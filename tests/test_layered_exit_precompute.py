@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.analysis.signals import MarketData, Position, SignalAction, TradingSignal
+from src.analysis.strategies.exit.layered_exit import LayeredExitStrategy
+
+
+def _features(rows: int = 160) -> pd.DataFrame:
+    rng = np.random.default_rng(7)
+    dates = pd.bdate_range("2025-01-06", periods=rows)
+    close = 1000 + np.cumsum(rng.normal(0, 25, rows))
+    close[90:120] -= np.linspace(0, 250, 30)
+    frame = pd.DataFrame(
+        {
+            "Close": close,
+            "EMA_20": pd.Series(close).ewm(span=20).mean().to_numpy(),
+            "EMA_50": pd.Series(close).ewm(span=50).mean().to_numpy(),
+            "EMA_200": pd.Series(close).ewm(span=200).mean().to_numpy(),
+            "RSI": rng.uniform(20, 80, rows),
+            "MACD": rng.normal(0, 5, rows),
+            "MACD_Hist": rng.normal(0, 3, rows),
+            "ATR": rng.uniform(10, 40, rows),
+            "Volume": rng.uniform(1e5, 5e5, rows),
+        },
+        index=dates,
+    )
+    frame.loc[frame.index[30:40], "ATR"] = np.nan
+    return frame
+
+
+def _trades(features: pd.DataFrame) -> pd.DataFrame:
+    dates = pd.date_range(features.index[0], features.index[-1], freq="W-FRI")
+    rng = np.random.default_rng(11)
+    return pd.DataFrame(
+        {
+            "EnDate": dates,
+            "FrgnBal": rng.choice([-80_000_000.0, -20_000_000.0, 5_000_000.0, 40_000_000.0], len(dates)),
+        }
+    )
+
+
+def _financials() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "DiscDate": pd.to_datetime(["2024-11-01", "2025-02-10", "2025-05-12", "2025-08-08"]),
+            "Sales": [1000.0, 1150.0, 900.0, 980.0],
+            "OperatingProfit": [100.0, 130.0, 70.0, 90.0],
+            "FSales": [1050.0, 1100.0, 1000.0, 900.0],
+        }
+    )
+
+
+def _market_data(features, trades, financials, row_pos: int) -> MarketData:
+    current_date = pd.Timestamp(features.index[row_pos])
+    return MarketData(
+        ticker="7203",
+        current_date=current_date,
+        df_features=features.iloc[: row_pos + 1],
+        df_trades=trades.loc[trades["EnDate"] <= current_date],
+        df_financials=financials.loc[financials["DiscDate"] <= current_date],
+        metadata={},
+    )
+
+
+def _position(features: pd.DataFrame, entry_pos: int) -> Position:
+    return Position(
+        ticker="7203",
+        entry_price=float(features["Close"].iloc[entry_pos]),
+        entry_date=pd.Timestamp(features.index[entry_pos]),
+        quantity=100,
+        entry_signal=TradingSignal(
+            action=SignalAction.BUY,
+            confidence=0.8,
+            reasons=["entry"],
+            strategy_name="Entry",
+        ),
+    )
+
+
+@pytest.mark.parametrize("use_score_utils", [True, False])
+@pytest.mark.parametrize("review_days", [90, 7])
+def test_primed_context_matches_daily_exit_signals(use_score_utils: bool, review_days: int) -> None:
+    features = _features()
+    trades = _trades(features)
+    financials = _financials()
+    daily = LayeredExitStrategy(use_score_utils=use_score_utils, review_days=review_days)
+    primed = LayeredExitStrategy(use_score_utils=use_score_utils, review_days=review_days)
+    assert primed.prime_exit_context(
+        ticker="7203",
+        features=features,
+        trades=trades,
+        financials=financials,
+    )
+
+    triggers = set()
+    for entry_pos in (3, 25, 60, 95):
+        daily_position = _position(features, entry_pos)
+        primed_position = _position(features, entry_pos)
+        for row_pos in range(entry_pos, len(features)):
+            market_data = _market_data(features, trades, financials, row_pos)
+            expected = daily.generate_exit_signal(daily_position, market_data)
+            actual = primed.generate_exit_signal(primed_position, market_data)
+
+            assert actual.action == expected.action
+            assert actual.confidence == expected.confidence
+            assert actual.reasons == expected.reasons
+            assert actual.metadata == expected.metadata
+            assert primed_position.peak_price_since_entry == primed_position.entry_price
+            triggers.add(expected.metadata.get("trigger"))
+
+    assert len(triggers) >= 3
+
+
+def test_primed_deterioration_matches_daily_for_every_entry_offset() -> None:
+    features = _features()
+    trades = _trades(features)
+    financials = _financials()
+    daily = LayeredExitStrategy()
+    primed = LayeredExitStrategy()
+    primed.prime_exit_context(ticker="7203", features=features, trades=trades, financials=financials)
+
+    detected = 0
+    for entry_pos in range(0, len(features), 5):
+        position = _position(features, entry_pos)
+        for row_pos in range(len(features)):
+            market_data = _market_data(features, trades, financials, row_pos)
+            context, row = primed._locate_context(market_data)
+            expected = daily._check_deterioration(position, market_data)
+
+            assert primed._check_deterioration(position, market_data, context, row) == expected
+            detected += expected is not None
+
+    assert detected > 0
+
+
+def test_context_is_skipped_when_features_are_not_a_prefix() -> None:
+    features = _features()
+    strategy = LayeredExitStrategy()
+    assert strategy.prime_exit_context(ticker="7203", features=features)
+
+    shifted = MarketData(
+        ticker="7203",
+        current_date=pd.Timestamp(features.index[50]),
+        df_features=features.iloc[10:51],
+        df_trades=pd.DataFrame(),
+        df_financials=pd.DataFrame(),
+        metadata={},
+    )
+    assert strategy._locate_context(shifted) == (None, -1)
+
+
+def test_prime_rejects_features_missing_required_columns() -> None:
+    features = _features().drop(columns=["ATR"])
+    strategy = LayeredExitStrategy()
+
+    assert not strategy.prime_exit_context(ticker="7203", features=features)
+    assert strategy._contexts == {}
+
+
+def test_primed_trailing_stop_respects_restored_peak_without_mutating_position() -> None:
+    features = _features()
+    daily = LayeredExitStrategy(use_score_utils=False)
+    primed = LayeredExitStrategy(use_score_utils=False)
+    primed.prime_exit_context(ticker="7203", features=features)
+
+    for row_pos in range(60, 80):
+        market_data = _market_data(features, _trades(features).iloc[:0], _financials().iloc[:0], row_pos)
+        daily_position = _position(features, 50)
+        primed_position = _position(features, 50)
+        daily_position.peak_price_since_entry = primed_position.peak_price_since_entry = 5000.0
+
+        expected = daily.generate_exit_signal(daily_position, market_data)
+        actual = primed.generate_exit_signal(primed_position, market_data)
+
+        assert (actual.action, actual.reasons, actual.metadata) == (
+            expected.action,
+            expected.reasons,
+            expected.metadata,
+        )
+        assert primed_position.peak_price_since_entry == 5000.0
+
+
+def test_priority_layer_zero_only_on_bars_where_layers_one_to_four_hold() -> None:
+    features = _features()
+    trades = _trades(features)
+    financials = _financials()
+    strategy = LayeredExitStrategy()
+    strategy.prime_exit_context(ticker="7203", features=features, trades=trades, financials=financials)
+    context = strategy._contexts["7203"]
+
+    assert {0, 2, 3} <= set(context.priority_layer.tolist())
+    for entry_pos in range(0, len(features), 5):
+        position = _position(features, entry_pos)
+        for row_pos in np.flatnonzero(context.priority_layer == 0):
+            market_data = _market_data(features, trades, financials, int(row_pos))
+            assert strategy._check_priority_layers(position, market_data, None, -1) is None
@@ -0,0 +1,418 @@
+from __future__ import annotations
+
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.analysis.scoring_utils import (
+    EARNINGS_DATES_KEY,
+    check_earnings_risk,
+    make_score_combiner,
+    prepare_earnings_dates,
+    prepare_financials,
+    calculate_volatility_score,
+    calculate_volatility_score_series,
+    calculate_composite_score,
+    calculate_composite_scores,
+    calculate_composite_score_panel,
+    calculate_institutional_score,
+    calculate_institutional_score_series,
+    calculate_technical_score,
+    calculate_technical_score_series,
+    calculate_fundamental_score,
+    calculate_fundamental_score_series,
+    detect_institutional_exodus,
+    detect_trend_breakdown,
+    detect_trend_breakdown_series,
+    detect_market_deterioration,
+)
+
+
+def _trades() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "EnDate": pd.to_datetime(["2025-03-07", "2025-03-14", "2025-03-21", "2025-03-28"]),
+            "FrgnBal": [40_000_000.0, -30_000_000.0, -30_000_000.0, -30_000_000.0],
+        }
+    )
+
+
+def test_exodus_window_matches_for_sorted_unsorted_and_string_dates() -> None:
+    sorted_trades = _trades()
+    unsorted_trades = sorted_trades.iloc[[2, 0, 3, 1]]
+    string_trades = sorted_trades.assign(EnDate=sorted_trades["EnDate"].dt.strftime("%Y-%m-%d"))
+
+    for current_date, expected in (
+        (pd.Timestamp("2025-03-21"), True),
+        (pd.Timestamp("2025-03-28"), True),
+        (pd.Timestamp("2025-03-14"), False),
+    ):
+        for trades in (sorted_trades, unsorted_trades, string_trades):
+            assert bool(detect_institutional_exodus(trades, current_date)) is expected
+
+
+def test_exodus_window_excludes_start_and_does_not_mutate_input() -> None:
+    trades = _trades().assign(EnDate=lambda frame: frame["EnDate"].dt.strftime("%Y-%m-%d"))
+    original = trades.copy()
+
+    # 2025-03-07 is exactly 14 days before and sits outside the (start, end] window;
+    # including its +40M would lift the net flow above the -50M threshold.
+    assert bool(detect_institutional_exodus(trades, pd.Timestamp("2025-03-21"), window_days=14))
+    pd.testing.assert_frame_equal(trades, original)
+
+
+def test_market_deterioration_uses_both_trade_windows() -> None:
+    entry = pd.Series({"Close": 110.0, "EMA_200": 100.0, "MACD_Hist": 1.0})
+    current = pd.Series({"Close": 95.0, "EMA_200": 100.0, "MACD_Hist": 0.5})
+    trades = _trades().iloc[[3, 0, 1, 2]]
+
+    message = detect_market_deterioration(
+        entry,
+        current,
+        trades,
+        pd.Timestamp("2025-03-07"),
+        pd.Timestamp("2025-03-28"),
+    )
+
+    assert message == "Market deterioration: Trend reversed + Foreign reversal"
+
+
+def test_fundamental_score_is_independent_of_disclosure_row_order() -> None:
+    financials = pd.DataFrame(
+        {
+            "DiscDate": pd.to_datetime(["2025-02-10", "2025-05-12", "2025-08-08"]),
+            "Sales": [1000.0, 1200.0, 1000.0],
+            "OperatingProfit": [100.0, 130.0, 150.0],
+            "FSales": [1000.0, 1100.0, 900.0],
+        }
+    )
+
+    expected = calculate_fundamental_score(financials)
+
+    assert expected == 70.0
+    for order in itertools.permutations(range(3)):
+        assert calculate_fundamental_score(financials.iloc[list(order)]) == expected
+
+
+def test_fundamental_score_unsorted_same_day_ties_match_sort_values() -> None:
+    months = [3, 3, 3, 2, 3, 1, 3, 3, 1, 2, 3]
+    sales = [1000.0] * len(months)
+    sales[6] = 800.0
+    financials = pd.DataFrame(
+        {
+            "DiscDate": pd.to_datetime([f"2025-{month:02d}-10" for month in months]),
+            "Sales": sales,
+            "OperatingProfit": [100.0] * len(months),
+            "FSales": [0.0] * len(months),
+        }
+    )
+    reference = financials.sort_values("DiscDate", kind="stable")
+
+    assert reference.index[-2:].tolist() == [7, 10]
+    assert calculate_fundamental_score(financials) == calculate_fundamental_score(reference)
+    assert calculate_fundamental_score(financials) == 50.0
+
+
+def test_prepare_financials_casts_and_sorts_without_changing_scores() -> None:
+    raw = pd.DataFrame(
+        {
+            "DiscDate": ["2025-08-08", "2025-02-10", "2025-05-12"],
+            "Sales": ["1000", "1000", "1200"],
+            "OperatingProfit": ["150", "100", ""],
+            "FSales": ["900", "1000", "1100"],
+            "Note": ["c", "a", "b"],
+        }
+    )
+    snapshot = raw.copy()
+
+    prepared = prepare_financials(raw)
+
+    pd.testing.assert_frame_equal(raw, snapshot)
+    assert prepared["Note"].tolist() == ["a", "b", "c"]
+    assert (prepared[["Sales", "OperatingProfit", "FSales"]].dtypes == "float64").all()
+    assert calculate_fundamental_score(prepared) == calculate_fundamental_score(raw)
+    assert prepare_financials(prepared) is prepared
+
+
+def test_fundamental_score_treats_unparseable_values_as_missing() -> None:
+    financials = pd.DataFrame(
+        {
+            "DiscDate": pd.to_datetime(["2025-02-10", "2025-05-12"]),
+            "Sales": ["1000", "1200"],
+            "OperatingProfit": [None, 130.0],
+            "FSales": ["n/a", "n/a"],
+        },
+        dtype=object,
+    )
+
+    # Only sales growth (+20%) is scored; missing profit and forecast are skipped.
+    assert calculate_fundamental_score(financials) == 65.0
+
+
+def test_technical_score_series_matches_latest_row_scores() -> None:
+    features = pd.DataFrame(
+        {
+            "Close": [120.0, 120.0, 90.0, 105.0, np.nan, 101.0],
+            "EMA_20": [110.0, 125.0, 95.0, 104.0, 100.0, 102.0],
+            "EMA_50": [105.0, 110.0, 98.0, 103.0, 100.0, 101.0],
+            "EMA_200": [100.0, 100.0, 100.0, 100.0, 100.0, 101.0],
+            "RSI": [50.0, 80.0, 25.0, 70.0, np.nan, 65.0],
+            "MACD_Hist": [1.0, -1.0, 0.5, 0.0, np.nan, 2.0],
+            "MACD": [1.0, 1.0, -1.0, 1.0, np.nan, 0.0],
+        }
+    )
+
+    series = calculate_technical_score_series(features)
+
+    assert series.tolist() == [95.0, 50.0, 45.0, 70.0, 50.0, 70.0]
+    mixed = features.assign(Label="x", Volume=np.arange(len(features)))
+    for row_pos in range(len(features)):
+        assert calculate_technical_score(features.iloc[: row_pos + 1]) == series.iloc[row_pos]
+        assert calculate_technical_score(mixed.iloc[: row_pos + 1]) == series.iloc[row_pos]
+
+
+def test_institutional_score_window_includes_start_date_for_any_row_order() -> None:
+    trades = _trades()
+    dates = pd.DatetimeIndex(["2025-03-07", "2025-03-14", "2025-04-11", "2025-04-18"])
+    series = calculate_institutional_score_series(dates, trades)
+
+    # 2025-04-11 minus 35 days is 2025-03-07, which is still inside the window.
+    assert series.tolist() == [70.0, 70.0, 35.0, 35.0]
+    for frame in (trades, trades.iloc[[3, 1, 0, 2]]):
+        original = frame.copy()
+        for current_date, expected in zip(dates, series):
+            assert calculate_institutional_score(frame, current_date) == expected
+        pd.testing.assert_frame_equal(frame, original)
+
+
+def test_universe_composite_scores_match_per_ticker_scores() -> None:
+    dates = pd.bdate_range("2025-02-03", periods=30)
+    rng = np.random.default_rng(3)
+    universe = {}
+    for ticker, drift in (("7203", 2.0), ("6758", -2.0)):
+        close = 1000 + np.cumsum(rng.normal(drift, 5, len(dates)))
+        universe[ticker] = {
+            "features": pd.DataFrame(
+                {
+                    "Close": close,
+                    "EMA_20": close - drift * 5,
+                    "EMA_50": close - drift * 10,
+                    "EMA_200": close - drift * 20,
+                    "RSI": rng.uniform(30, 70, len(dates)),
+                    "MACD_Hist": rng.normal(0, 1, len(dates)),
+                    "MACD": rng.normal(0, 1, len(dates)),
+                    "ATR": rng.uniform(10, 20, len(dates)),
+                },
+                index=dates,
+            ),
+            "trades": _trades(),
+            "financials": pd.DataFrame(
+                {
+                    "DiscDate": pd.to_datetime(["2024-11-01", "2025-02-10"]),
+                    "Sales": [1000.0, 1200.0],
+                    "OperatingProfit": [100.0, 90.0],
+                }
+            ),
+        }
+    universe["9999"] = {"features": pd.DataFrame()}
+
+    scores = calculate_composite_scores(universe, current_date=pd.Timestamp("2025-03-14"))
+
+    assert scores.index.tolist() == ["7203", "6758", "9999"]
+    for ticker, data in universe.items():
+        total, breakdown = calculate_composite_score(
+            data["features"],
+            data.get("trades", pd.DataFrame()),
+            data.get("financials", pd.DataFrame()),
+            {},
+            current_date=pd.Timestamp("2025-03-14"),
+        )
+        assert scores.loc[ticker, "total"] == total
+        for component, value in breakdown.items():
+            assert scores.loc[ticker, component] == value
+
+
+def test_score_combiner_matches_weight_dict_sum() -> None:
+    weights = {"technical": 0.35, "institutional": 0.35, "fundamental": 0.2, "volatility": 0.1}
+    combine = make_score_combiner(weights)
+    rng = np.random.default_rng(5)
+
+    for tech, inst, fund, vol in rng.uniform(0, 100, (50, 4)).tolist():
+        assert combine(tech, inst, fund, vol) == (
+            tech * weights["technical"]
+            + inst * weights["institutional"]
+            + fund * weights["fundamental"]
+            + vol * weights["volatility"]
+        )
+
+
+def test_composite_score_panel_matches_per_ticker_prefix_scores() -> None:
+    rng = np.random.default_rng(17)
+    frames = {}
+    for ticker, drift in (("7203", 1.5), ("6758", -1.5)):
+        dates = pd.bdate_range("2025-02-03", periods=30)
+        close = 1000 + np.cumsum(rng.normal(drift, 8, len(dates)))
+        frames[ticker] = pd.DataFrame(
+            {
+                "Close": close,
+                "EMA_20": close - drift * 5,
+                "EMA_50": close - drift * 10,
+                "EMA_200": close - drift * 20,
+                "RSI": rng.uniform(25, 80, len(dates)),
+                "MACD_Hist": rng.normal(0, 1, len(dates)),
+                "MACD": rng.normal(0, 1, len(dates)),
+                "ATR": rng.uniform(10, 20, len(dates)),
+            },
+            index=dates,
+        )
+    panel = pd.concat(frames, names=["ticker", "date"])
+    trades = pd.concat([_trades().assign(ticker="7203"), _trades().iloc[:2].assign(ticker="6758")])
+    financials = pd.DataFrame(
+        {
+            "ticker": ["7203", "7203", "6758"],
+            "DiscDate": pd.to_datetime(["2024-11-01", "2025-02-20", "2025-02-10"]),
+            "Sales": [1000.0, 1200.0, 900.0],
+            "OperatingProfit": [100.0, 90.0, 80.0],
+        }
+    )
+
+    scores = calculate_composite_score_panel(panel, trades, financials)
+
+    assert scores.index.equals(panel.index)
+    for (ticker, current_date), row in scores.iloc[::3].iterrows():
+        features = frames[ticker].loc[:current_date]
+        ticker_trades = trades.loc[(trades["ticker"] == ticker) & (trades["EnDate"] <= current_date)]
+        ticker_financials = financials.loc[
+            (financials["ticker"] == ticker) & (financials["DiscDate"] <= current_date)
+        ]
+        total, breakdown = calculate_composite_score(
+            features, ticker_trades, ticker_financials, {}, current_date=current_date
+        )
+        assert row["total"] == pytest.approx(total)
+        for component, value in breakdown.items():
+            assert row[component] == value
+
+
+def test_volatility_score_series_matches_prefix_scores() -> None:
+    rng = np.random.default_rng(5)
+    atr = rng.uniform(10, 20, 90)
+    atr[70:] *= 2.0
+    atr[40:45] *= 0.4
+    atr_z = np.full(90, np.nan)
+    atr_z[60:] = rng.normal(0, 1.2, 30)
+    features = pd.DataFrame({"ATR": atr, "ATR_Z_60": atr_z})
+
+    series = calculate_volatility_score_series(features)
+
+    assert set(series.iloc[:19]) == {50.0}
+    assert {30.0, 50.0, 70.0} <= set(series.iloc[19:])
+    for row_pos in range(len(features)):
+        assert calculate_volatility_score(features.iloc[: row_pos + 1]) == series.iloc[row_pos]
+
+
+def test_earnings_risk_uses_prepared_dates_and_skips_bad_events() -> None:
+    metadata = {
+        "earnings_calendar": [
+            {"Date": "2025-05-12"},
+            {"Date": "not-a-date"},
+            {"Code": "7203"},
+            {"Date": "2025-02-10"},
+            {"Date": None},
+        ]
+    }
+    raw = dict(metadata)
+    prepared = prepare_earnings_dates(metadata)
+
+    assert EARNINGS_DATES_KEY not in metadata
+    assert prepared is not metadata
+
+    assert prepared[EARNINGS_DATES_KEY].tolist() == [
+        np.datetime64("2025-02-10", "D").item(),
+        np.datetime64("2025-05-12", "D").item(),
+    ]
+    for current_date, expected in (
+        ("2025-02-03", (True, 7)),
+        ("2025-02-02", (False, 999)),
+        ("2025-02-10", (True, 0)),
+        ("2025-02-11", (False, 999)),
+        ("2025-05-09", (True, 3)),
+    ):
+        assert check_earnings_risk(prepared, pd.Timestamp(current_date)) == expected
+        assert check_earnings_risk(raw, pd.Timestamp(current_date)) == expected
+
+    assert check_earnings_risk({}, pd.Timestamp("2025-02-10")) == (False, 999)
+
+
+def test_institutional_series_matches_scalar_scores_in_both_modes() -> None:
+    rng = np.random.default_rng(9)
+    dates = pd.bdate_range("2025-01-06", periods=60)
+    trades = pd.DataFrame(
+        {
+            "EnDate": dates,
+            "FrgnBal": rng.integers(-5, 6, len(dates)) * 1_000_000.0,
+            "TrustBal": rng.integers(-3, 4, len(dates)) * 1_000_000.0,
+            "IndividualBal": rng.integers(-4, 5, len(dates)) * 1_000_000.0,
+        }
+    )
+    trades.loc[5, "TrustBal"] = np.nan
+    trades.loc[[8, 30], "FrgnBal"] = np.nan
+    trades = trades.iloc[rng.permutation(len(trades))]
+
+    for use_smart_money in (True, False):
+        series = calculate_institutional_score_series(dates, trades, use_smart_money=use_smart_money)
+
+        assert len(set(series)) > 2
+        for current_date, expected in zip(dates, series):
+            assert (
+                calculate_institutional_score(trades, current_date, use_smart_money=use_smart_money)
+                == expected
+            )
+
+
+def test_fundamental_score_series_matches_prefix_scores_near_tier_edges() -> None:
+    financials = pd.DataFrame(
+        {
+            "DiscDate": pd.to_datetime(
+                ["2024-05-10", "2024-08-09", "2024-11-08", "2025-02-10", "2025-05-12", "2025-08-08"]
+            ),
+            # 增长率落在各档位阈值附近（含浮点误差），逐档与标量打分对比
+            "Sales": [1000.0, 1050.0, 1155.0, 1097.25, 1036.90125, 1161.32940],
+            "OperatingProfit": [100.0, 108.0, 124.2, 111.78, 0.0, 50.0],
+            "FSales": [np.nan, 1000.0, 1100.0, "n/a", 1100.0, 1000.0],
+        }
+    ).iloc[[3, 0, 5, 1, 4, 2]]
+    dates = pd.DatetimeIndex(["2024-05-01", "2024-05-10", "2024-09-02", "2024-11-08", "2025-03-03", "2025-06-02", "2025-09-01"])
+
+    series = calculate_fundamental_score_series(dates, financials)
+
+    assert series.iloc[:2].tolist() == [50.0, 50.0]
+    assert len(set(series)) > 3
+    for current_date, expected in zip(dates, series):
+        disclosed = financials.loc[financials["DiscDate"] <= current_date]
+        assert calculate_fundamental_score(disclosed) == expected
+
+
+def test_trend_breakdown_matches_series_for_every_prefix() -> None:
+    rng = np.random.default_rng(13)
+    rows = 80
+    close = 1000 + np.cumsum(rng.normal(-3, 20, rows))
+    features = pd.DataFrame(
+        {
+            "Close": close,
+            "EMA_200": close + rng.normal(0, 30, rows),
+            "RSI": rng.uniform(25, 55, rows),
+            "MACD_Hist": rng.normal(0, 2, rows),
+            "Volume": rng.uniform(1e5, 5e5, rows),
+            "Label": ["x"] * rows,
+        },
+        index=pd.bdate_range("2025-01-06", periods=rows),
+    )
+    features.loc[features.index[40:45], "Volume"] = np.nan
+
+    for frame in (features, features.assign(Return_5d=features["Close"].pct_change(5))):
+        series = detect_trend_breakdown_series(frame)
+        assert series.notna().sum() > 5
+        for row_pos in range(rows):
+            assert detect_trend_breakdown(frame.iloc[: row_pos + 1]) == series.iloc[row_pos]